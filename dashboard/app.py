@@ -1,15 +1,44 @@
-from ipyleaflet import Marker, DivIcon, Map, basemaps, leaflet, Popup
-from shiny import App, reactive, ui
+import asyncio
+import functools
+import os
+from startup import StartupTimer, lazy_import
+
+startup_timer = StartupTimer()
+
+# The heavy libraries only used to build figures and maps are loaded on first use,
+# by the first session, instead of when the app starts
+if os.environ.get("CB_DASHBOARD_LAZY_IMPORTS", "1") == "1":
+    for module in (
+        "ipyleaflet",
+        "numpy",
+        "pandas",
+        "plotly.express",
+        "plotly.graph_objects",
+        "plotly.io",
+    ):
+        lazy_import(module)
+
+import ipyleaflet
+from shiny import App, reactive, render, ui
 from shinywidgets import output_widget, render_widget
 import pandas as pd
 import shiny.experimental as x
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly_streaming import render_plotly_streaming
+from dataset import get_partitions
+from geo import get_geo_table
+from cache import figure_cache, map_cache
+from progress import ThrottledProgress
 from pathlib import Path
+from svg_charts import donut_chart_svg
 import faicons
+import ipywidgets
 from datetime import datetime
 
+startup_timer.mark("imports")
+
 category_colors = {
     "Serverless": 0,
     "Containers": 1,
@@ -20,14 +49,35 @@ category_colors = {
     "Network C&D": 6,
     "AI Engineering": 7,
     "Machine Learning": 8,
+    # Names used by the 2024 snapshot
+    "Security & Identity": 3,
+    "Networking & Content Delivery": 6,
+    "Machine Learning & GenAI": 8,
+    "Front-End Web & Mobile": 9,
+    "Game Tech": 10,
+    "Storage": 11,
 }
 
-def read_data():
-    df = pd.read_csv(
-        Path(__file__).parent / "data/anonymized_cb_data_2025.csv", delimiter=";"
-    )
-    df["cohort"] = df["cohort"].astype(str)
-    return df
+# Columns that can be filtered by clicking on the charts and the map, with the label
+# shown in the list of active filters
+FILTER_COLUMNS = {
+    "region": "Region",
+    "cohort": "Cohort",
+    "category": "Category",
+    "country": "Country",
+}
+
+# How countries are drawn on the map: "markers" adds one Marker widget per country,
+# "geojson" sends all of them as a single GeoJSON layer of circles
+MAP_LAYER = os.environ.get("CB_DASHBOARD_MAP_LAYER", "markers")
+
+# How the popup of a country shows its categories: "figure" embeds an interactive
+# Plotly FigureWidget, "svg" a static SVG chart rendered by the server
+MAP_POPUP = os.environ.get("CB_DASHBOARD_MAP_POPUP", "figure")
+
+# Number of markers added to the map at a time, between which the other sessions of
+# the process are served
+MARKER_BATCH = 10
 
 
 def get_color_theme(theme, list_categories=None):
@@ -81,6 +131,30 @@ def get_color_theme(theme, list_categories=None):
     return final_list_colors
 
 
+def get_color_sequence(color_theme, categories=None, count=None, reverse=False):
+    """Colors of the slices or bars of a figure: the colors of ``categories``, or the
+    first ``count`` colors of the theme, in reverse order if ``reverse``."""
+
+    colors = get_color_theme(color_theme, categories)[:count]
+    return colors[::-1] if reverse else colors
+
+
+def other_filters(filters, *columns):
+    """Filters of every column but ``columns``, as keyword arguments of cube lookups.
+
+    Each chart is filtered by the values selected in the other charts only, so that
+    every value of its own column stays visible and can be selected instead.
+    """
+    return {column: value for column, value in filters if column not in columns}
+
+
+def highlight_selection(fig, labels, filters, column):
+    """Pull the slice of the value selected in ``column`` out of a pie chart."""
+    selected = dict(filters).get(column)
+    if selected is not None:
+        fig.update_traces(pull=[0.1 if label == selected else 0 for label in labels])
+
+
 def get_color_template(mode):
     if mode == "light":
         return "plotly_white"
@@ -88,6 +162,12 @@ def get_color_template(mode):
         return "plotly_dark"
 
 
+@functools.lru_cache(maxsize=None)
+def get_template(mode):
+    # The template dict is shared by the figures of every session
+    return pio.templates[get_color_template(mode)].to_plotly_json()
+
+
 def get_background_color_plotly(mode):
     if mode == "light":
         return "white"
@@ -96,46 +176,52 @@ def get_background_color_plotly(mode):
 
 
 def get_map_theme(mode):
-    print(mode)
     if mode == "light":
-        return basemaps.CartoDB.Positron
+        return ipyleaflet.basemaps.CartoDB.Positron
     else:
-        return basemaps.CartoDB.DarkMatter
+        return ipyleaflet.basemaps.CartoDB.DarkMatter
+
+
+def set_map_theme(basemap, mode):
+    """Point the base tile layer of a map to the tiles of ``mode``.
+
+    Only the URL of the existing layer changes, so the markers, popups and controls
+    of the map are kept and the tiles are reloaded by the browser.
+    """
+    theme = get_map_theme(mode)
+    with basemap.hold_sync():
+        basemap.url = theme.build_url()
+        basemap.name = theme.get("name", "")
+
+
+# Markup of the marker icons, styled by the .cb-marker rules of the page, so that only
+# the size and the count differ from one icon to another
+MARKER_ICON_HTML = (
+    '<svg class="cb-marker" width="{size}" height="{size}" viewBox="0 0 42 42">'
+    '<circle cx="21" cy="21" r="15.91549430918954"></circle>'
+    '<text x="50%" y="60%">{count}</text></svg>'
+)
 
 
-def create_custom_icon(count):
+@functools.lru_cache(maxsize=None)
+def get_custom_icon_html(count):
 
     size_circle = 45 + (count / 10)
 
-    # Define the HTML code for the icon
-    html_code = f"""
-    <div style=".leaflet-div-icon.background:transparent !important;
-        position:relative; width: {size_circle}px; height: {size_circle}px;">
-        <svg width="{size_circle}" height="{size_circle}" viewBox="0 0 42 42"
-            class="donut" aria-labelledby="donut-title donut-desc" role="img">
-            <circle class="donut-hole" cx="21" cy="21" r="15.91549430918954"
-                fill="white" role="presentation"></circle>
-            <circle class="donut-ring" cx="21" cy="21" r="15.91549430918954"
-                fill="transparent" stroke="color(display-p3 0.9451 0.6196 0.2196)"
-                stroke-width="3" role="presentation"></circle>
-            <text x="50%" y="60%" text-anchor="middle" font-size="13"
-                font-weight="bold" fill="#000">{count}</text>
-        </svg>
-    </div>
-    """
+    return MARKER_ICON_HTML.format(size=f"{size_circle:g}", count=count)
+
+
+def create_custom_icon(html_code):
 
     # Create a custom DivIcon
-    return DivIcon(
-        icon_size=(50, 50), icon_anchor=(25, 25), html=html_code, class_name="dummy"
-    )
+    return ipyleaflet.DivIcon(icon_size=(50, 50), icon_anchor=(25, 25), html=html_code)
 
 
-def create_custom_popup(country, total, dark_mode, color_theme):
+def get_popup_figure(dataset, country, total, dark_mode, color_theme, filters=()):
 
-    # Group by 'region' and count occurrences of each region
-    df = read_data()
-    category_counts = (
-        df[df.country == country].groupby("category").size().reset_index(name="count")
+    # Count the Community Builders of each category in the country
+    category_counts = dataset.cube.counts(
+        "category", country=country, **other_filters(filters, "country", "category")
     )
 
     # Create a pie chart using plotly.graph_objects
@@ -168,10 +254,406 @@ def create_custom_popup(country, total, dark_mode, color_theme):
     figure.layout.width = 600
     figure.layout.height = 400
 
-    popup = Popup(child=go.FigureWidget(figure), max_width=600, max_height=400)
+    return figure.to_dict()
+
+
+def create_custom_popup_content(figure):
+
+    # The figure was validated by plotly when it was built
+    return go.FigureWidget(figure, _validate=False)
+
+
+def get_popup_svg(dataset, country, total, dark_mode, color_theme, filters=()):
+
+    # Same chart as get_popup_figure(), as plain SVG markup
+    category_counts = dataset.cube.counts(
+        "category", country=country, **other_filters(filters, "country", "category")
+    )
+
+    return donut_chart_svg(
+        category_counts["category"].tolist(),
+        category_counts["count"].tolist(),
+        get_color_theme(color_theme, category_counts["category"]),
+        title=f"{total} Community Builders in {country}",
+        background=get_background_color_plotly(dark_mode),
+        font_color=get_template(dark_mode)["layout"]["font"]["color"],
+    )
+
+
+def create_custom_popup_svg(
+    dataset, country, total, dark_mode, color_theme, filters=()
+):
+
+    # The chart of each popup is rendered once per process, data version and filters
+    return map_cache.get_or_create(
+        ("popup_svg", country, dark_mode, color_theme, dataset.version, filters),
+        lambda: get_popup_svg(dataset, country, total, dark_mode, color_theme, filters),
+    )
+
+
+def get_popup_content(dataset, country, dark_mode, color_theme, filters=()):
+    """Figure dict or SVG markup of the popup of ``country``, depending on MAP_POPUP.
+
+    It only reads the data and the process caches, so it can run in a worker thread.
+    """
+    total = dataset.cube.total(country=country, **dict(filters))
+    if MAP_POPUP == "svg":
+        return create_custom_popup_svg(
+            dataset, country, total, dark_mode, color_theme, filters
+        )
+
+    # The figure of each popup is built once per process, data version and filters
+    return map_cache.get_or_create(
+        ("popup", country, dark_mode, color_theme, dataset.version, filters),
+        lambda: get_popup_figure(
+            dataset, country, total, dark_mode, color_theme, filters
+        ),
+    )
+
+
+def get_map_markers(dataset, filters=()):
+    """Serializable spec of the marker of every country with Community Builders."""
+
+    # Calculate country counts from CB data
+    df_country_counts = dataset.cube.counts(
+        "country", **other_filters(filters, "country")
+    )
+
+    # Look up the GPS coordinates in the shared country table, and only include
+    # countries that have CB members and coordinates
+    located, coordinates = get_geo_table().locate(df_country_counts["country"])
+    df_countries = df_country_counts[located]
+
+    return [
+        {
+            "country": row.country,
+            "count": int(row.count),
+            "location": (float(latitude), float(longitude)),
+            "icon_html": get_custom_icon_html(int(row.count)),
+        }
+        for row, (latitude, longitude) in zip(
+            df_countries.itertuples(index=False), coordinates
+        )
+    ]
+
+
+def get_cached_markers(dataset, filters=()):
+
+    # Marker specs are computed once per process, data version and filters, so new
+    # sessions only have to create the widgets
+    return map_cache.get_or_create(
+        ("markers", dataset.version, filters), lambda: get_map_markers(dataset, filters)
+    )
+
+
+def get_map_geojson(dataset, filters=()):
+    """GeoJSON FeatureCollection with one point per country with Community Builders."""
+
+    markers = get_cached_markers(dataset, filters)
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [spec["location"][1], spec["location"][0]],
+            },
+            "properties": {
+                "country": spec["country"],
+                "count": spec["count"],
+                # Same size as the marker icons
+                "style": {"radius": (45 + spec["count"] / 10) / 2},
+            },
+        }
+        for spec in markers
+    ]
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+def get_cached_geojson(dataset, filters=()):
+    return map_cache.get_or_create(
+        ("geojson", dataset.version, filters), lambda: get_map_geojson(dataset, filters)
+    )
+
+
+def create_custom_geojson_layer(data):
+
+    return ipyleaflet.GeoJSON(
+        data=data,
+        point_style={
+            "color": "#F19E38",
+            "weight": 3,
+            "opacity": 1,
+            "fillColor": "white",
+            "fillOpacity": 1,
+        },
+        hover_style={"fillColor": "#F19E38"},
+    )
+
+
+def create_country_figure(cube, filters=()):
+
+    df_countries = cube.counts(
+        "country", **other_filters(filters, "country")
+    ).sort_values("count", ascending=False)
+
+    df_other_countries = pd.DataFrame(
+        [["Others", df_countries[10:]["count"].sum()]],
+        columns=["country", "count"],
+    )
+    df_countries = df_countries[:10]
+    df_countries = pd.concat([df_countries, df_other_countries])
+
+    # Plot 0: Bar Chart of Community Builders by Category
+    fig0 = px.pie(
+        df_countries,
+        names="country",
+        values="count",
+        hole=0.3,
+        labels={"country": "Country", "count": "Number of Community Builders"},
+        title="Community Builders by Country",
+        template="none",
+    )
+
+    fig0.update_layout(title_x=0.5)
+    fig0.update_traces(
+        textposition="outside", textinfo="percent+label", textfont=dict(size=15)
+    )
+    fig0.update_layout(showlegend=False)
+
+    return fig0, {}
+
+
+def create_region_figure(cube, filters=()):
+
+    df_regions = cube.counts("region", **other_filters(filters, "region"))
+
+    # Plot 0: Bar Chart of Community Builders by Category
+    fig0 = px.pie(
+        df_regions,
+        names="region",
+        values="count",
+        hole=0.3,
+        labels={"region": "Region", "count": "Number of Community Builders"},
+        title="Community Builders by Region",
+        template="none",
+    )
+
+    fig0.update_layout(title_x=0.5)
+    fig0.update_traces(
+        textposition="outside", textinfo="percent+label", textfont=dict(size=15)
+    )
+    fig0.update_layout(showlegend=False)
+    highlight_selection(fig0, df_regions["region"], filters, "region")
+
+    return fig0, {}
+
+
+def create_cohort_figure(cube, filters=()):
+
+    df_cohorts = cube.counts("cohort", **other_filters(filters, "cohort"))
+    fig1 = px.pie(
+        df_cohorts,
+        names="cohort",
+        values="count",
+        hole=0.3,
+        labels={"cohort": "Cohort", "count": "Number of Community Builders"},
+        title="Community Builders by Cohort",
+        template="none",
+    )
+
+    fig1.update_layout(title_x=0.5)
+    fig1.update_traces(
+        textposition="outside", textinfo="percent+label", textfont=dict(size=15)
+    )
+    fig1.update_layout(showlegend=False)
+    highlight_selection(fig1, df_cohorts["cohort"], filters, "cohort")
+
+    return fig1, {}
+
+
+def create_category_figure(cube, filters=()):
+
+    df_categories = cube.counts(
+        "category", **other_filters(filters, "category")
+    ).sort_values("count", ascending=False)
+    fig2 = px.pie(
+        df_categories,
+        names="category",
+        values="count",
+        hole=0.3,
+        labels={"category": "Category", "count": "Number of Community Builders"},
+        title="Community Builders by Category",
+        template="none",
+    )
+
+    fig2.update_layout(title_x=0.5)
+    fig2.update_traces(
+        textposition="outside", textinfo="percent+label", textfont=dict(size=15)
+    )
+    fig2.update_layout(showlegend=False)
+    highlight_selection(fig2, df_categories["category"], filters, "category")
+
+    return fig2, {"categories": list(df_categories["category"])}
+
+
+def create_cohort_category_figure(cube, filters=()):
+
+    where = other_filters(filters, "cohort")
+    df_counts = cube.counts("cohort", "category", **where)
+    total_cohort = cube.counts("cohort", **where)
+
+    # Create the bar plot
+    fig3 = px.bar(
+        df_counts,
+        x="cohort",
+        y="count",
+        color="category",
+        text="count",
+        text_auto=True,
+        labels={
+            "cohort": "Cohort",
+            "count": "Number of Community Builders",
+            "category": "Category",
+        },
+        title="N° Community Builders by Cohort and Category",
+        template="none",
+        category_orders={
+            "cohort": ["2020 beta", "2020", "2021", "2022", "2023", "2024"]
+        },
+    )
+
+    fig3.update_traces(textposition="inside")
+
+    fig3.add_trace(
+        go.Scatter(
+            x=total_cohort["cohort"],
+            y=total_cohort["count"],
+            text=total_cohort["count"],
+            mode="text",
+            textposition="top center",
+            textfont=dict(
+                size=15,
+            ),
+            showlegend=False,
+        )
+    )
+
+    fig3.update_layout(title_x=0.5)
+    fig3.update_layout(uniformtext_minsize=8, uniformtext_mode="hide")
+    fig3.update_yaxes(range=[0, max(total_cohort["count"], default=0) + 100])
+    return fig3, {"categories": list(df_counts["category"])}
+
+
+def create_top_countries_figure(cube, filters=()):
+
+    where = other_filters(filters, "country")
+    top_10_countries = cube.counts("country", **where).sort_values(
+        "count", ascending=False
+    )[:10]
+    list_top_10_countries = top_10_countries["country"].values
+    country_index = {
+        country: index for index, country in enumerate(list_top_10_countries)
+    }
+    df_top_10_countries = cube.counts("country", "cohort", **where)
+    df_top_10_countries["country_index"] = df_top_10_countries["country"].map(
+        country_index
+    )
+    df_top_10_countries = df_top_10_countries.dropna(
+        subset=["country_index"]
+    ).sort_values("country_index")
+
+    fig4 = px.bar(
+        df_top_10_countries,
+        x="country",
+        y="count",
+        color="cohort",
+        text="count",
+        labels={
+            "country": "Country",
+            "count": "Number of Community Builders",
+            "cohort": "Cohort",
+        },
+        title="Top 10 countries with more Community Builders by Cohort",
+        template="none",
+        category_orders={
+            "cohort": ["2024", "2023", "2022", "2021", "2020", "2020 beta"]
+        },
+    )
+    fig4.update_traces(textposition="inside")
+
+    fig4.add_trace(
+        go.Scatter(
+            x=top_10_countries["country"],
+            y=top_10_countries["count"],
+            text=top_10_countries["count"],
+            mode="text",
+            textposition="top center",
+            textfont=dict(size=15),
+            showlegend=False,
+        )
+    )
+
+    fig4.update_layout(title_x=0.5)
+    fig4.update_layout(uniformtext_minsize=8, uniformtext_mode="hide")
+    fig4.update_yaxes(range=[0, max(top_10_countries["count"], default=0) + 40])
+    return fig4, {"count": len(df_top_10_countries.cohort.unique()), "reverse": True}
 
-    return popup
 
+def get_cached_figure(create_figure, dataset, filters=()):
+    """Unstyled figure built by ``create_figure``, shared by all the sessions.
+
+    ``filters`` is a sorted tuple of (column, value) pairs. Figures are only looked
+    up from the count cube of the dataset, so filtered figures cost the same to build
+    whatever the number of rows. The figure does not depend on the mode or the color
+    theme, which are applied by ``style_figure``.
+
+    Returns
+    -------
+    dict
+        The ``figure`` dict, and the keyword arguments of ``get_color_sequence`` for
+        the ``colors`` of its slices or bars.
+    """
+
+    def create():
+        figure, colors = create_figure(dataset.cube, filters)
+        return {"figure": figure.to_dict(), "colors": colors}
+
+    return figure_cache.get_or_create(
+        (create_figure.__name__, dataset.version, filters), create
+    )
+
+
+def style_figure(cached, dark_mode, color_theme):
+    """Figure dict of a figure from ``get_cached_figure`` in a mode and color theme.
+
+    Only the template, the background and the colors are set, without building the
+    figure again, so changing the mode or the theme only restyles the shown figures.
+    """
+
+    figure = cached["figure"]
+    colors = get_color_sequence(color_theme, **cached["colors"])
+    layout = {
+        **figure["layout"],
+        "template": get_template(dark_mode),
+        "paper_bgcolor": get_background_color_plotly(dark_mode),
+    }
+    data = list(figure["data"])
+    if data and data[0]["type"] == "pie":
+        layout["piecolorway"] = colors
+    else:
+        # Like Plotly Express, the n-th bar trace takes the n-th color
+        bars = [index for index, trace in enumerate(data) if trace["type"] == "bar"]
+        for n, index in enumerate(bars):
+            marker = {**data[index]["marker"], "color": colors[n % len(colors)]}
+            data[index] = {**data[index], "marker": marker}
+    return {"data": data, "layout": layout}
+
+
+# Only the yearly files are listed here, each year is loaded when first selected
+partitions = get_partitions()
+startup_timer.mark("partitions")
 
 app_ui = ui.page_fillable(
     ui.page_navbar(
@@ -184,28 +666,28 @@ app_ui = ui.page_fillable(
                         showcase=faicons.icon_svg(
                             "people-group", width="50px", fill="#FD9902 !important"
                         ),
-                        value=len(read_data()),
+                        value=ui.output_text("n_builders"),
                     ),
                     ui.value_box(
                         title="N° Countries",
                         showcase=faicons.icon_svg(
                             "globe", width="50px", fill="#FD9902 !important"
                         ),
-                        value=len(read_data().country.unique()),
+                        value=ui.output_text("n_countries"),
                     ),
                     ui.value_box(
                         title="N° Categories",
                         showcase=faicons.icon_svg(
                             "list", width="50px", fill="#FD9902 !important"
                         ),
-                        value=len(read_data().category.unique()),
+                        value=ui.output_text("n_categories"),
                     ),
                     ui.value_box(
                         title="N° Cohorts",
                         showcase=faicons.icon_svg(
                             "calendar", width="50px", fill="#FD9902 !important"
                         ),
-                        value=len(read_data().cohort.unique()),
+                        value=ui.output_text("n_cohorts"),
                     ),
                     col_widths=(3, 3, 3, 3),
                 ),
@@ -237,7 +719,15 @@ app_ui = ui.page_fillable(
         ),
         title=ui.img(src="images/logo.png", style="max-width:100px;width:100%"),
         id="page",
+        # Filters selected by clicking on the charts and the map, shown on every panel
+        header=ui.output_ui("active_filters"),
         sidebar=ui.sidebar(
+            ui.input_select(
+                id="year",
+                label="Year",
+                choices=[str(year) for year in reversed(partitions.years)],
+                selected=str(partitions.latest_year),
+            ),
             ui.input_select(
                 id="color_theme",
                 label="Color theme",
@@ -273,6 +763,17 @@ app_ui = ui.page_fillable(
             background: transparent !important;
             border: transparent !important;
         }
+        .cb-marker circle {
+            fill: white;
+            stroke: color(display-p3 0.9451 0.6196 0.2196);
+            stroke-width: 3;
+        }
+        .cb-marker text {
+            text-anchor: middle;
+            font-size: 13px;
+            font-weight: bold;
+            fill: #000;
+        }
         .collapse-toggle {
             color: #FD9902 !important;
         }
@@ -300,338 +801,424 @@ app_ui = ui.page_fillable(
 
 def server(input, output, session):
 
-    df = read_data()
+    # Values selected by clicking on the charts and the map, as a sorted tuple of
+    # (column, value) pairs so that it can be part of cache keys
+    filters = reactive.Value(())
 
-    # Read countries metadata (GPS coordinates only)
-    df_countries_metadata = pd.read_csv(
-        Path(__file__).parent / "data/countries.csv", delimiter=";"
-    )
-    
-    # Calculate country counts from CB data
-    df_country_counts = (
-        df.groupby("country")
-        .size()
-        .reset_index(name="count")
-    )
-    
-    # Merge GPS coordinates with calculated counts
-    df_countries = df_countries_metadata.merge(
-        df_country_counts, 
-        on="country", 
-        how="inner"  # Only include countries that have CB members
-    )
+    def toggle_filter(column, value):
+        selected = dict(filters.get())
+        if selected.get(column) == value:
+            del selected[column]
+        else:
+            selected[column] = value
+        filters.set(tuple(sorted(selected.items())))
+
+    def filter_on_click(column, attribute):
+        """Click callback of a chart, selecting the ``attribute`` of the clicked point."""
+
+        def callback(trace, points, state):
+            if points.point_inds:
+                toggle_filter(column, trace[attribute][points.point_inds[0]])
+
+        return callback
+
+    @reactive.Effect
+    @reactive.event(input.clear_filters)
+    def clear_filters():
+        filters.set(())
+
+    @reactive.Effect
+    @reactive.event(input.year, ignore_init=True)
+    def reset_filters():
+        # Values of one year may not exist in another one
+        filters.set(())
+
+    @reactive.Calc
+    def dataset():
+        # Only the partition of the selected year is loaded and queried
+        return partitions[int(input.year())]
+
+    @reactive.Calc
+    def summary():
+        if not filters():
+            return partitions.summary(int(input.year()))
+        cube = dataset().cube
+        where = dict(filters())
+        return {
+            "rows": cube.total(**where),
+            "countries": len(cube.counts("country", **where)),
+            "categories": len(cube.counts("category", **where)),
+            "cohorts": len(cube.counts("cohort", **where)),
+        }
+
+    @output
+    @render.ui
+    def active_filters():
+        if not filters():
+            return None
+        return ui.div(
+            ui.span(
+                "Filtered by: "
+                + ", ".join(
+                    f"{FILTER_COLUMNS[column]} {value}" for column, value in filters()
+                )
+            ),
+            ui.input_action_button(
+                "clear_filters", "Clear filters", class_="btn-sm ms-2"
+            ),
+            class_="d-flex align-items-center justify-content-center p-2",
+        )
+
+    @output
+    @render.text
+    def n_builders():
+        return summary()["rows"]
+
+    @output
+    @render.text
+    def n_countries():
+        return summary()["countries"]
+
+    @output
+    @render.text
+    def n_categories():
+        return summary()["categories"]
+
+    @output
+    @render.text
+    def n_cohorts():
+        return summary()["cohorts"]
+
+    # Functions updating the map currently shown to the selected filters and mode,
+    # set by map_full()
+    map_state = {}
+
+    # The data of the map layer and the charts of the popups are computed in worker
+    # threads, so that the event loop keeps serving the other sessions meanwhile.
+    # Widgets are bound to the session, so they are still created on the event loop
+    @reactive.extended_task
+    async def load_map_layer(data, shown):
+        get_layer = get_cached_geojson if MAP_LAYER == "geojson" else get_cached_markers
+        return data.version, shown, await asyncio.to_thread(get_layer, data, shown)
+
+    @reactive.extended_task
+    async def load_popup(data, key, location):
+        content = await asyncio.to_thread(get_popup_content, data, *key)
+        return data.version, key, location, content
+
+    @reactive.Effect
+    def show_map_layer():
+        loaded = load_map_layer.result()
+        with reactive.isolate():
+            if "show_layer" in map_state:
+                map_state["show_layer"](*loaded)
+
+    @reactive.Effect
+    def show_popup():
+        loaded = load_popup.result()
+        with reactive.isolate():
+            if "show_popup" in map_state:
+                map_state["show_popup"](*loaded)
+
+    # Incremented to add the markers waiting to be shown to the map
+    marker_batches = reactive.Value(0)
+
+    @reactive.Effect
+    def stream_markers():
+        marker_batches()
+        with reactive.isolate():
+            more = "add_markers" in map_state and map_state["add_markers"]()
+        if more:
+            # The next batch is added once the other sessions had their turn
+            reactive.invalidate_later(0)
 
     @reactive.Calc
     @output
     @render_widget
-    @reactive.event(input.dark_mode)
+    @reactive.event(input.year)
     def map_full():
-        map = Map(
+        data = dataset()
+        map = ipyleaflet.Map(
             basemap=get_map_theme(input.dark_mode()),
             center=(25.00, 20.00),
             zoom=3,
             scroll_wheel_zoom=True,
         )
-
-        with ui.Progress(min=0, max=len(df_countries)) as progress:
-            progress.set(
-                message="Calculation in progress", detail="This may take a while..."
+        map.add_control(ipyleaflet.leaflet.ScaleControl(position="bottomleft"))
+        # Changing the mode only swaps the tiles of the base layer
+        basemap = map.layers[0]
+        map_state["set_mode"] = lambda mode: set_map_theme(basemap, mode)
+        # The progress bar of the markers of the previous map may still be shown
+        if map_state.get("progress") is not None:
+            map_state.pop("progress").close()
+
+        # A single popup is shared by all the countries. Its content is only built
+        # the first time a country is clicked in a mode and color theme, and then
+        # reused for the session, so it is restyled when it is next opened
+        popup = None
+        popup_contents = {}
+
+        def open_country_popup(country, location):
+            with reactive.isolate():
+                # The popup shows every category of the country
+                where = other_filters(filters(), "country", "category")
+                key = (
+                    country,
+                    input.dark_mode(),
+                    input.color_theme(),
+                    tuple(sorted(where.items())),
+                )
+            if key in popup_contents:
+                show_country_popup(data.version, key, location, None)
+            else:
+                load_popup.invoke(data, key, location)
+
+        def show_country_popup(version, key, location, content):
+            nonlocal popup
+            # Charts of the data of another year are dropped
+            if version != data.version:
+                return
+            if key not in popup_contents:
+                if MAP_POPUP != "svg":
+                    content = create_custom_popup_content(content)
+                popup_contents[key] = content
+            content = popup_contents[key]
+            if MAP_POPUP == "svg":
+                # A single HTML widget shows the chart of every country
+                html = ipywidgets.HTML() if popup is None else popup.child
+                html.value = content
+                content = html
+            if popup is None:
+                popup = ipyleaflet.Popup(
+                    location=location, child=content, max_width=600, max_height=400
+                )
+                # Adding the popup to the map opens it
+                map.add_layer(popup)
+            else:
+                popup.child = content
+                popup.open_popup(location)
+
+        def on_country_click(country, location):
+            open_country_popup(country, location)
+            # Clicking a country also filters the charts by it
+            with reactive.isolate():
+                if dict(filters()).get("country") != country:
+                    toggle_filter("country", country)
+
+        def on_marker_click(country, location):
+            def callback(**kwargs):
+                on_country_click(country, location)
+
+            return callback
+
+        def on_feature_click(feature, **kwargs):
+            longitude, latitude = feature["geometry"]["coordinates"]
+            on_country_click(feature["properties"]["country"], (latitude, longitude))
+
+        # Markers only depend on the filters of the other columns than the country
+        def marker_filters(selected):
+            return tuple(sorted(other_filters(selected, "country").items()))
+
+        with reactive.isolate():
+            shown = marker_filters(filters())
+
+        def apply_filters(selected):
+            nonlocal shown
+            if marker_filters(selected) == shown:
+                return
+            shown = marker_filters(selected)
+            load_map_layer.invoke(data, shown)
+
+        def show_layer(version, loaded, layer_data):
+            # Layers of another year, or of filters changed since they were requested,
+            # are dropped
+            if version == data.version and loaded == shown:
+                update_layer(layer_data)
+
+        map_state.update(
+            apply_filters=apply_filters,
+            show_layer=show_layer,
+            show_popup=show_country_popup,
+            add_markers=lambda: False,
+        )
+        # The map is shown right away, and its layer is added once it is loaded
+        load_map_layer.invoke(data, shown)
+
+        if MAP_LAYER == "geojson":
+            layer = None
+
+            def update_layer(geojson):
+                nonlocal layer
+                if layer is not None:
+                    layer.data = geojson
+                    return
+                layer = create_custom_geojson_layer(geojson)
+                layer.on_click(on_feature_click)
+                map.add_layer(layer)
+
+            return map
+
+        # Marker widget and count of every country shown on the map
+        markers = {}
+        # Specs of the markers waiting to be added to the map, by country
+        pending = {}
+        # Markers with the same count share a single icon widget
+        icons = {}
+        # Whether the markers were loaded once, after which filtering them does not
+        # show the progress bar
+        loaded = False
+
+        def get_icon(spec):
+            icon = icons.get(spec["count"])
+            if icon is None:
+                icon = icons[spec["count"]] = create_custom_icon(spec["icon_html"])
+            return icon
+
+        def create_marker(spec):
+            # Create a marker with the custom icon
+            marker = ipyleaflet.Marker(
+                location=spec["location"],
+                icon=get_icon(spec),
+                draggable=False,
             )
 
-            for index, row in df_countries.iterrows():
-                lat = float(row["latitud"])
-                lon = float(row["longitud"])
-                country = row["country"]
-                count = row["count"]
-
-                # Add a marker with the custom icon to the map
-                custom_icon = create_custom_icon(count)
-
-                # Create custom Pie chart with Community Builders from each country
-                custom_popup = create_custom_popup(
-                    country, count, input.dark_mode(), input.color_theme()
+            # Show a Pie chart with Community Builders from the country on click
+            marker.on_click(on_marker_click(spec["country"], spec["location"]))
+
+            markers[spec["country"]] = (marker, spec["count"])
+            return marker
+
+        def update_layer(specs):
+            # Only the markers whose country or count changed are updated, and the
+            # new ones are left to stream_markers()
+            nonlocal loaded
+            visible = {spec["country"] for spec in specs}
+            removed = {
+                markers.pop(country)[0].model_id
+                for country in list(markers)
+                if country not in visible
+            }
+            pending.clear()
+            for spec in specs:
+                marker, count = markers.get(spec["country"], (None, None))
+                if marker is None:
+                    pending[spec["country"]] = spec
+                elif count != spec["count"]:
+                    marker.icon = get_icon(spec)
+                    markers[spec["country"]] = (marker, spec["count"])
+            if removed:
+                map.layers = tuple(
+                    layer for layer in map.layers if layer.model_id not in removed
                 )
-
-                marker = Marker(
-                    location=(lat, lon),
-                    icon=custom_icon,
-                    draggable=False,
-                    popup=custom_popup,
+            if not loaded and pending:
+                # Only a few of the per-batch updates are sent to the browser
+                progress = map_state["progress"] = ThrottledProgress(
+                    min=0, max=len(pending)
                 )
+                progress.set(
+                    message="Calculation in progress", detail="This may take a while..."
+                )
+            loaded = True
+            marker_batches.set(marker_batches.get() + 1)
+
+        def add_markers():
+            """Add the next batch of pending markers, returning whether any are left."""
+            batch = [pending.pop(country) for country in list(pending)[:MARKER_BATCH]]
+            # The layers of the map are replaced once per batch, instead of sending the
+            # whole list of layers for every marker added
+            map.layers += tuple(create_marker(spec) for spec in batch)
+
+            progress = map_state.get("progress")
+            if progress is not None:
+                if pending:
+                    progress.inc(
+                        len(batch),
+                        message=f"Calculating country {batch[-1]['country']}",
+                    )
+                else:
+                    map_state.pop("progress").close()
+            return bool(pending)
+
+        map_state["add_markers"] = add_markers
+        return map
 
-                map.add_layer(marker)
-
-                progress.set(index, message=f"Calculating country {country}")
+    @reactive.Effect
+    @reactive.event(input.dark_mode, ignore_init=True)
+    def restyle_map():
+        # The map is restyled in place rather than rebuilt
+        if "set_mode" in map_state:
+            map_state["set_mode"](input.dark_mode())
+
+    @reactive.Effect
+    @reactive.event(filters, ignore_init=True)
+    def filter_map():
+        # The map is updated in place rather than rebuilt
+        if "apply_filters" in map_state:
+            map_state["apply_filters"](filters())
+
+    def figure_data(create_figure):
+        """Calc of the unstyled figure of ``create_figure``.
+
+        It only depends on the data and the filters: changing the mode or the color
+        theme restyles the figure it returned, without building it again.
+        """
 
-            map.add_control(leaflet.ScaleControl(position="bottomleft"))
+        @reactive.Calc
+        def figure():
+            return get_cached_figure(create_figure, dataset(), filters())
 
-            progress.set(index, message="Rendering the map...")
+        return figure
 
-        return map
+    country_figure = figure_data(create_country_figure)
+    region_figure = figure_data(create_region_figure)
+    cohort_figure = figure_data(create_cohort_figure)
+    category_figure = figure_data(create_category_figure)
+    cohort_category_figure = figure_data(create_cohort_category_figure)
+    top_countries_figure = figure_data(create_top_countries_figure)
 
     @reactive.Calc
     @output
     @render_plotly_streaming()
     def plot_tmp():
-
-        df_countries = (
-            df.groupby("country")
-            .size()
-            .reset_index(name="count")
-            .sort_values("count", ascending=False)[:10]
-        )
-
-        df_other_countries = pd.DataFrame(
-            [
-                [
-                    "Others",
-                    df.groupby("country")
-                    .size()
-                    .reset_index(name="count")
-                    .sort_values("count", ascending=False)[10:]["count"]
-                    .sum(),
-                ]
-            ],
-            columns=["country", "count"],
-        )
-        df_countries = pd.concat([df_countries, df_other_countries])
-
-        # Plot 0: Bar Chart of Community Builders by Category
-        fig0 = px.pie(
-            df_countries,
-            names="country",
-            values="count",
-            hole=0.3,
-            labels={"country": "Country", "count": "Number of Community Builders"},
-            title="Community Builders by Country",
-            template=get_color_template(input.dark_mode()),
-            color_discrete_sequence=get_color_theme(input.color_theme()),
-        )
-
-        fig0.update_layout(
-            paper_bgcolor=get_background_color_plotly(input.dark_mode()), title_x=0.5
-        )
-        fig0.update_traces(
-            textposition="outside", textinfo="percent+label", textfont=dict(size=15)
-        )
-        fig0.update_layout(showlegend=False)
-
-        return fig0
+        return style_figure(country_figure(), input.dark_mode(), input.color_theme())
 
     @reactive.Calc
     @output
-    @render_plotly_streaming()
+    @render_plotly_streaming(on_click=filter_on_click("region", "labels"))
     def plot_0():
-
-        # Plot 0: Bar Chart of Community Builders by Category
-        fig0 = px.pie(
-            df.groupby("region").size().reset_index(name="count"),
-            names="region",
-            values="count",
-            hole=0.3,
-            labels={"region": "Region", "count": "Number of Community Builders"},
-            title="Community Builders by Region",
-            template=get_color_template(input.dark_mode()),
-            color_discrete_sequence=get_color_theme(input.color_theme()),
-        )
-
-        fig0.update_layout(
-            paper_bgcolor=get_background_color_plotly(input.dark_mode()), title_x=0.5
-        )
-        fig0.update_traces(
-            textposition="outside", textinfo="percent+label", textfont=dict(size=15)
-        )
-        fig0.update_layout(showlegend=False)
-
-        return fig0
+        return style_figure(region_figure(), input.dark_mode(), input.color_theme())
 
     @reactive.Calc
     @output
-    @render_plotly_streaming()
+    @render_plotly_streaming(on_click=filter_on_click("cohort", "labels"))
     def plot_2():
-
-        fig1 = px.pie(
-            df.groupby("cohort").size().reset_index(name="count"),
-            names="cohort",
-            values="count",
-            hole=0.3,
-            labels={"cohort": "Cohort", "count": "Number of Community Builders"},
-            title="Community Builders by Cohort",
-            template=get_color_template(input.dark_mode()),
-            color_discrete_sequence=get_color_theme(input.color_theme()),
-        )
-
-        fig1.update_layout(
-            paper_bgcolor=get_background_color_plotly(input.dark_mode()), title_x=0.5
-        )
-        fig1.update_traces(
-            textposition="outside", textinfo="percent+label", textfont=dict(size=15)
-        )
-        fig1.update_layout(showlegend=False)
-
-        return fig1
+        return style_figure(cohort_figure(), input.dark_mode(), input.color_theme())
 
     @reactive.Calc
     @output
-    @render_plotly_streaming()
+    @render_plotly_streaming(on_click=filter_on_click("category", "labels"))
     def plot_1():
-
-        df_categories = (
-            df.groupby("category")
-            .size()
-            .reset_index(name="count")
-            .sort_values("count", ascending=False)
-        )
-        fig2 = px.pie(
-            df_categories,
-            names="category",
-            values="count",
-            hole=0.3,
-            labels={"category": "Category", "count": "Number of Community Builders"},
-            title="Community Builders by Category",
-            template=get_color_template(input.dark_mode()),
-            color_discrete_sequence=get_color_theme(
-                input.color_theme(), df_categories.category
-            ),
-        )
-
-        fig2.update_layout(
-            paper_bgcolor=get_background_color_plotly(input.dark_mode()), title_x=0.5
-        )
-        fig2.update_traces(
-            textposition="outside", textinfo="percent+label", textfont=dict(size=15)
-        )
-        fig2.update_layout(showlegend=False)
-
-        return fig2
+        return style_figure(category_figure(), input.dark_mode(), input.color_theme())
 
     @reactive.Calc
     @output
-    @render_plotly_streaming()
+    @render_plotly_streaming(on_click=filter_on_click("cohort", "x"))
     def plot_4():
-
-        df_counts = (
-            df[["cohort", "category"]]
-            .value_counts()
-            .reset_index(name="count")
-            .sort_values(by=["cohort", "category"])
-        )
-        total_cohort = (
-            df[["cohort"]]
-            .value_counts()
-            .reset_index(name="count")
-            .sort_values(by="cohort")
-        )
-
-        # Create the bar plot
-        fig3 = px.bar(
-            df_counts,
-            x="cohort",
-            y="count",
-            color="category",
-            text="count",
-            text_auto=True,
-            labels={
-                "cohort": "Cohort",
-                "count": "Number of Community Builders",
-                "category": "Category",
-            },
-            title="N° Community Builders by Cohort and Category",
-            template=get_color_template(input.dark_mode()),
-            color_discrete_sequence=get_color_theme(
-                input.color_theme(), df_counts.category
-            ),
-            category_orders={
-                "cohort": ["2020 beta", "2020", "2021", "2022", "2023", "2024"]
-            },
-        )
-
-        fig3.update_traces(textposition="inside")
-
-        fig3.add_trace(
-            go.Scatter(
-                x=total_cohort["cohort"],
-                y=total_cohort["count"],
-                text=total_cohort["count"],
-                mode="text",
-                textposition="top center",
-                textfont=dict(
-                    size=15,
-                ),
-                showlegend=False,
-            )
+        return style_figure(
+            cohort_category_figure(), input.dark_mode(), input.color_theme()
         )
 
-        fig3.update_layout(
-            paper_bgcolor=get_background_color_plotly(input.dark_mode()), title_x=0.5
-        )
-        fig3.update_layout(uniformtext_minsize=8, uniformtext_mode="hide")
-        fig3.update_yaxes(range=[0, max(total_cohort["count"]) + 100])
-        return fig3
-
     @reactive.Calc
     @output
-    @render_plotly_streaming()
+    @render_plotly_streaming(on_click=filter_on_click("country", "x"))
     def plot_3():
-
-        top_10_countries = (
-            df.groupby(["country"])
-            .size()
-            .reset_index(name="count")
-            .sort_values("count", ascending=False)[:10]
-        )
-        list_top_10_countries = top_10_countries["country"].values
-        country_index = {
-            country: index for index, country in enumerate(list_top_10_countries)
-        }
-        df["country_index"] = df["country"].map(country_index)
-        df_top_10_countries = (
-            df[[row in list_top_10_countries for row in df.country]]
-            .groupby(["country", "country_index", "cohort"])
-            .size()
-            .reset_index(name="count")
-            .sort_values("country_index")
+        return style_figure(
+            top_countries_figure(), input.dark_mode(), input.color_theme()
         )
 
-        fig4 = px.bar(
-            df_top_10_countries,
-            x="country",
-            y="count",
-            color="cohort",
-            text="count",
-            labels={
-                "country": "Country",
-                "count": "Number of Community Builders",
-                "cohort": "Cohort",
-            },
-            title="Top 10 countries with more Community Builders by Cohort",
-            template=get_color_template(input.dark_mode()),
-            color_discrete_sequence=(get_color_theme(input.color_theme())[:(len(df_top_10_countries.cohort.unique()))][::-1]),
-            category_orders={
-                "cohort": ["2024", "2023", "2022", "2021", "2020", "2020 beta"]
-            },
-        )
-        fig4.update_traces(textposition="inside")
-
-        fig4.add_trace(
-            go.Scatter(
-                x=top_10_countries["country"],
-                y=top_10_countries["count"],
-                text=top_10_countries["count"],
-                mode="text",
-                textposition="top center",
-                textfont=dict(size=15),
-                showlegend=False,
-            )
-        )
-
-        fig4.update_layout(
-            paper_bgcolor=get_background_color_plotly(input.dark_mode()), title_x=0.5
-        )
-        fig4.update_layout(uniformtext_minsize=8, uniformtext_mode="hide")
-        fig4.update_yaxes(range=[0, max(top_10_countries["count"]) + 40])
-        return fig4
-
 
 static_dir = Path(__file__).parent / "static"
 app = App(app_ui, server, static_assets=static_dir)
+
+startup_timer.mark("UI")
+startup_timer.report()
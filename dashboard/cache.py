@@ -0,0 +1,88 @@
+import collections
+import os
+import pickle
+import threading
+
+
+def _pickled_size(value):
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by the size of its values.
+
+    The cache lives at process level so that values computed for one session can be
+    reused by every other session served by the same worker.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Approximate memory cap. Least recently used entries are evicted until the
+        total size of the cached values is below it. Values larger than the cap are
+        never cached.
+    sizeof : callable, optional
+        Function returning the approximate size in bytes of a value. Defaults to the
+        size of its pickled representation.
+    """
+
+    def __init__(self, max_bytes, sizeof=_pickled_size):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = collections.OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._nbytes += size
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_size
+
+    def get_or_create(self, key, factory):
+        """Return the value cached for ``key``, calling ``factory()`` on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+# Serialized map marker and popup specs shared by all the sessions of the process
+map_cache = LRUCache(
+    max_bytes=int(os.environ.get("CB_DASHBOARD_MAP_CACHE_MB", "32")) * 1024 * 1024
+)
+
+# Dicts of the dashboard figures shared by all the sessions of the process
+figure_cache = LRUCache(
+    max_bytes=int(os.environ.get("CB_DASHBOARD_FIGURE_CACHE_MB", "32")) * 1024 * 1024
+)
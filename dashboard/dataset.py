@@ -0,0 +1,472 @@
+import functools
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path(__file__).parent / "data"
+DEFAULT_DATA_FILE = DATA_DIR / "anonymized_cb_data_2025.csv"
+
+# Yearly snapshots are stored as one file per year, e.g. anonymized_cb_data_2024.csv
+PARTITION_FILE_PATTERN = re.compile(r"anonymized_cb_data_(\d{4})\.csv")
+
+# Columns of the Community Builders exports. All of them have a small number of
+# distinct values, so they are stored dictionary-encoded as pandas categoricals.
+CATEGORICAL_COLUMNS = ("category", "cohort", "country", "region")
+
+
+def file_version(path):
+    """Identifier of the content of ``path``, used to tell versions of a data file apart.
+
+    Files written by ``src/format_2025_data.py`` have a manifest next to them with a
+    data version that changes on every refresh, which is used as long as the file has
+    not been modified since. Otherwise the version is a short hash of the content,
+    which is only computed once per size and mtime of the file.
+    """
+    path = Path(path)
+    stat = path.stat()
+    return _file_version(path, stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=64)
+def _file_version(path, size, mtime_ns):
+    try:
+        manifest = json.loads(path.with_suffix(".manifest.json").read_text())
+        if (manifest["size"], manifest["mtime_ns"]) == (size, mtime_ns):
+            return manifest["version"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+
+
+def _sidecar_root(path):
+    return path.parent / ".cache" / path.stem
+
+
+def _load_sidecar(root, version):
+    """Frame stored in the sidecar of ``version``, memory-mapping its codes."""
+    directory = root / version
+    meta = json.loads((directory / "columns.json").read_text())
+    columns = {
+        column: pd.Categorical.from_codes(
+            np.load(directory / f"{column}.npy", mmap_mode="r"),
+            categories=meta["categories"][column],
+        )
+        for column in meta["columns"]
+    }
+    return pd.DataFrame(columns, copy=False)
+
+
+def _save_sidecar(root, version, frame):
+    """Store the dictionary codes and categories of every column of ``frame``."""
+    if (root / version).exists():
+        return
+    root.mkdir(parents=True, exist_ok=True)
+    # Written to a temporary directory first, so that other processes never see a
+    # partial sidecar
+    staging = Path(tempfile.mkdtemp(dir=root, prefix=".tmp-"))
+    try:
+        for column in frame.columns:
+            np.save(staging / f"{column}.npy", frame[column].cat.codes.to_numpy())
+        meta = {
+            "columns": list(frame.columns),
+            "categories": {
+                column: frame[column].cat.categories.tolist()
+                for column in frame.columns
+            },
+        }
+        (staging / "columns.json").write_text(json.dumps(meta))
+        # mkdtemp() creates the directory for its owner only, while workers running
+        # as another user than the one building the cache must be able to read it
+        os.chmod(staging, 0o755)
+        os.replace(staging, root / version)
+    except OSError:
+        # Another process stored the same version in the meantime
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _write_pointer(root, version, stat):
+    """Point the sidecar at ``version`` for the current size and mtime of the CSV."""
+    pointer = {"version": version, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    staging = root / f".tmp-current-{os.getpid()}.json"
+    staging.write_text(json.dumps(pointer))
+    os.replace(staging, root / "current.json")
+    # Processes that mapped an older version keep it until they exit
+    for entry in root.iterdir():
+        if entry.is_dir() and entry.name != version and not entry.name.startswith("."):
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def read_frame(path):
+    """Read a Community Builders CSV export into a frame of categoricals.
+
+    The parsed columns are kept as a binary sidecar of NumPy dictionary codes in a
+    ``.cache`` directory next to the file, which is memory-mapped by later reads. The
+    sidecar is used as long as the size and mtime of the CSV are unchanged, or its
+    content hash still matches, and rebuilt from the CSV otherwise.
+
+    Returns
+    -------
+    tuple
+        The frame and the version of the file (see :func:`file_version`).
+    """
+    path = Path(path)
+    root = _sidecar_root(path)
+    stat = path.stat()
+    try:
+        pointer = json.loads((root / "current.json").read_text())
+        if (pointer["size"], pointer["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return _load_sidecar(root, pointer["version"]), pointer["version"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    version = file_version(path)
+    try:
+        frame = _load_sidecar(root, version)
+    except (OSError, ValueError, KeyError):
+        frame = pd.read_csv(
+            path,
+            delimiter=";",
+            dtype={column: "category" for column in CATEGORICAL_COLUMNS},
+        )
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in frame.dtypes):
+            return frame, version
+        try:
+            _save_sidecar(root, version, frame)
+        except OSError:
+            # Read-only deployments parse the CSV on every start
+            return frame, version
+    try:
+        _write_pointer(root, version, stat)
+    except OSError:
+        pass
+    return frame, version
+
+
+class CountCube:
+    """Number of Community Builders for every combination of the categorical columns.
+
+    The cube is built once from the dictionary codes of a frame, together with every
+    marginal of it, so that any count by one or more columns, optionally restricted to
+    given values of other columns, is an indexed lookup whose cost does not depend on
+    the number of rows.
+
+    Parameters
+    ----------
+    counts : numpy.ndarray
+        Array with one axis per entry of ``dimensions``.
+    dimensions : tuple of str
+        Name of the column of each axis of ``counts``.
+    labels : dict
+        Labels of the positions of each axis, keyed by column name.
+    marginals : dict, optional
+        Sums of ``counts`` over every other axis than the columns of each key, as
+        stored by :meth:`save`. They are computed from ``counts`` when omitted.
+    """
+
+    def __init__(self, counts, dimensions, labels, marginals=None):
+        self.dimensions = tuple(dimensions)
+        self.labels = {dim: list(labels[dim]) for dim in self.dimensions}
+        self._positions = {
+            dim: {label: i for i, label in enumerate(self.labels[dim])}
+            for dim in self.dimensions
+        }
+        if marginals is not None:
+            self._marginals = dict(marginals)
+            return
+        self._marginals = {}
+        for size in range(len(self.dimensions) + 1):
+            for kept in itertools.combinations(self.dimensions, size):
+                summed = tuple(
+                    axis for axis, dim in enumerate(self.dimensions) if dim not in kept
+                )
+                self._marginals[kept] = counts.sum(axis=summed)
+
+    @classmethod
+    def from_frame(cls, frame, dimensions=CATEGORICAL_COLUMNS):
+        labels = {dim: frame[dim].cat.categories for dim in dimensions}
+        shape = tuple(len(labels[dim]) for dim in dimensions)
+        codes = [frame[dim].cat.codes.to_numpy() for dim in dimensions]
+        # Rows with a missing value in any column are not counted
+        valid = np.logical_and.reduce([code >= 0 for code in codes])
+        flat = np.ravel_multi_index([code[valid] for code in codes], shape)
+        counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+        return cls(counts, dimensions, labels)
+
+    def save(self, directory):
+        """Store the cube in ``directory``, one ``.npy`` file per marginal.
+
+        The directory is written next to it first and then renamed, so that other
+        processes never see a partial cube.
+        """
+        directory = Path(directory)
+        if directory.exists():
+            return
+        staging = Path(tempfile.mkdtemp(dir=directory.parent, prefix=".tmp-"))
+        try:
+            meta = {
+                "dimensions": list(self.dimensions),
+                "labels": self.labels,
+                "marginals": [list(kept) for kept in self._marginals],
+            }
+            for index, array in enumerate(self._marginals.values()):
+                np.save(staging / f"{index}.npy", array)
+            (staging / "cube.json").write_text(json.dumps(meta))
+            # Readable by every worker, like the sidecar it is stored in
+            os.chmod(staging, 0o755)
+            os.replace(staging, directory)
+        except OSError:
+            # Another process stored the same cube in the meantime
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory):
+        """Cube stored in ``directory`` by :meth:`save`, memory-mapping its marginals.
+
+        The marginals are mapped read-only, so every process loading the same cube
+        shares a single copy of them in the page cache.
+        """
+        directory = Path(directory)
+        meta = json.loads((directory / "cube.json").read_text())
+        marginals = {
+            tuple(kept): np.load(directory / f"{index}.npy", mmap_mode="r")
+            for index, kept in enumerate(meta["marginals"])
+        }
+        dimensions = tuple(meta["dimensions"])
+        return cls(marginals[dimensions], dimensions, meta["labels"], marginals)
+
+    def _lookup(self, by, where):
+        dims = tuple(dim for dim in self.dimensions if dim in by or dim in where)
+        array = self._marginals[dims]
+        index = []
+        for dim in dims:
+            if dim in where:
+                position = self._positions[dim].get(where[dim])
+                if position is None:
+                    return np.zeros([len(self.labels[d]) for d in by], dtype=int)
+            if dim in where and dim not in by:
+                index.append(position)
+            else:
+                index.append(slice(None))
+        array = array[tuple(index)]
+        # Axes are in cube order after indexing; return them in the requested order
+        remaining = [dim for dim in dims if dim not in where or dim in by]
+        array = np.transpose(array, [remaining.index(dim) for dim in by])
+        # Columns both counted by and filtered on only keep the count of their value
+        for axis, dim in enumerate(by):
+            if dim in where:
+                keep = np.zeros(array.shape[axis], dtype=bool)
+                keep[self._positions[dim][where[dim]]] = True
+                shape = [1] * array.ndim
+                shape[axis] = -1
+                array = array * keep.reshape(shape)
+        return array
+
+    def total(self, **where):
+        """Number of Community Builders matching all of ``where``."""
+        return int(self._lookup((), where))
+
+    def counts(self, *by, **where):
+        """Counts by the columns in ``by`` among the rows matching all of ``where``.
+
+        Returns a frame with one column per entry of ``by`` plus a ``count`` column,
+        with one row per observed combination, sorted by the ``by`` columns. This is
+        the same frame as ``df.groupby(list(by)).size().reset_index(name="count")``.
+        """
+        array = self._lookup(by, where)
+        nonzero = np.nonzero(array)
+        data = {
+            dim: np.asarray(self.labels[dim], dtype=object)[positions]
+            for dim, positions in zip(by, nonzero)
+        }
+        data["count"] = array[nonzero]
+        return pd.DataFrame(data, columns=[*by, "count"])
+
+
+class Dataset:
+    """Read-only, dictionary-encoded Community Builders dataset.
+
+    The dataset is parsed once per process and version of the data (see
+    :func:`get_dataset`) and shared by every session, value box and popup, so
+    callers must treat it as immutable.
+
+    Parameters
+    ----------
+    frame : pandas.DataFrame
+        Frame with one categorical column per entry of ``CATEGORICAL_COLUMNS``.
+    version : str
+        Identifier of the data the frame was built from. It changes whenever the
+        source file changes, so it can be used as part of cache keys.
+    sidecar : pathlib.Path, optional
+        Directory of the binary sidecar of this version of the data (see
+        :func:`read_frame`), where the count cube is stored too.
+    """
+
+    def __init__(self, frame, version, sidecar=None):
+        self._frame = frame
+        self.version = version
+        self.sidecar = sidecar
+
+    @classmethod
+    def from_csv(cls, path):
+        frame, version = read_frame(path)
+        return cls(frame, version, _sidecar_root(Path(path)) / version)
+
+    def __len__(self):
+        return len(self._frame)
+
+    @functools.cached_property
+    def cube(self):
+        """Precomputed :class:`CountCube` over all the categorical columns.
+
+        The cube is stored in the sidecar by the first process that needs it, and
+        memory-mapped by every other one, so that the workers of the app share it
+        instead of each counting the rows into their own copy.
+        """
+        if self.sidecar is None:
+            return CountCube.from_frame(self._frame)
+        try:
+            return CountCube.load(self.sidecar / "cube")
+        except (OSError, ValueError, KeyError):
+            pass
+        cube = CountCube.from_frame(self._frame)
+        try:
+            cube.save(self.sidecar / "cube")
+        except OSError:
+            # Read-only deployments count the rows in every process
+            pass
+        return cube
+
+    @property
+    def frame(self):
+        """Shallow copy of the underlying frame.
+
+        Adding or replacing columns on the returned frame does not affect the shared
+        dataset, and no column data is copied.
+        """
+        return self._frame.copy(deep=False)
+
+    def categories(self, column):
+        """Distinct values of ``column`` that appear in the data."""
+        values = self._frame[column]
+        codes = values.cat.codes.to_numpy()
+        return list(values.cat.categories[np.unique(codes[codes >= 0])])
+
+    def nunique(self, column):
+        return len(self.categories(column))
+
+
+# Process-wide dataset of each file, with the version of the file it was loaded for
+_datasets = {}
+
+
+def get_dataset(path=DEFAULT_DATA_FILE):
+    """Return the process-wide dataset for the current version of ``path``.
+
+    The dataset is parsed on first use, and again once the file has changed, which is
+    only a stat of the file to check (see :func:`file_version`). Callers holding the
+    dataset of the previous version can keep using it.
+    """
+    path = Path(path)
+    version = file_version(path)
+    loaded = _datasets.get(path)
+    if loaded is None or loaded[0] != version:
+        loaded = _datasets[path] = (version, Dataset.from_csv(path))
+    return loaded[1]
+
+
+def summary_path(path):
+    return Path(path).with_suffix(".summary.json")
+
+
+def compute_summary(path=DEFAULT_DATA_FILE):
+    """Headline figures of the data in ``path``, as shown in the value boxes."""
+    dataset = get_dataset(path)
+    return {
+        "version": dataset.version,
+        "rows": len(dataset),
+        "countries": dataset.nunique("country"),
+        "categories": dataset.nunique("category"),
+        "cohorts": dataset.nunique("cohort"),
+    }
+
+
+def get_summary(path=DEFAULT_DATA_FILE):
+    """Headline figures of the data in ``path`` without parsing it.
+
+    They are read from the summary file stored next to the data file, which is only
+    trusted while its version matches the content of the data file. Otherwise the
+    summary is computed from the data and the file is rewritten.
+    """
+    version = file_version(path)
+    try:
+        summary = json.loads(summary_path(path).read_text())
+        if summary.get("version") == version:
+            return summary
+    except (OSError, ValueError):
+        pass
+    summary = compute_summary(path)
+    if summary["version"] != version:
+        # The file changed again while it was being read
+        return summary
+    try:
+        summary_path(path).write_text(json.dumps(summary, indent=2) + "\n")
+    except OSError:
+        # Read-only deployments still work, they just parse the data at startup
+        pass
+    return summary
+
+
+class PartitionedDataset:
+    """Yearly snapshots of the Community Builders data, one partition per file.
+
+    Only the file names are read up front. The data of a year is loaded the first time
+    it is queried, so adding the snapshot of a new year costs nothing to the sessions
+    that only look at other years.
+
+    Parameters
+    ----------
+    files : dict
+        Path of the snapshot of each year, keyed by year.
+    """
+
+    def __init__(self, files):
+        self.files = dict(sorted(files.items()))
+
+    @classmethod
+    def from_directory(cls, data_dir=DATA_DIR):
+        files = {}
+        for path in Path(data_dir).glob("anonymized_cb_data_*.csv"):
+            match = PARTITION_FILE_PATTERN.fullmatch(path.name)
+            if match:
+                files[int(match.group(1))] = path
+        return cls(files)
+
+    @property
+    def years(self):
+        return list(self.files)
+
+    @property
+    def latest_year(self):
+        return self.years[-1]
+
+    def __getitem__(self, year):
+        """Dataset of ``year``, parsed on first use."""
+        return get_dataset(self.files[year])
+
+    def summary(self, year):
+        """Headline figures of ``year`` (see :func:`get_summary`)."""
+        return get_summary(self.files[year])
+
+
+@functools.lru_cache(maxsize=None)
+def get_partitions(data_dir=DATA_DIR):
+    """Return the process-wide yearly partitions of the data in ``data_dir``."""
+    return PartitionedDataset.from_directory(data_dir)
@@ -0,0 +1,95 @@
+import functools
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+GEO_FILE = Path(__file__).parent / "data" / "geo.csv"
+
+# Separator of the other spellings of a country name in the aliases column
+ALIAS_SEPARATOR = "|"
+
+
+class GeoTable:
+    """Lookup table of the countries, keyed by ISO 3166-1 alpha-2 code.
+
+    Every row holds the canonical name of a country as used in the data, its other
+    spellings, its region and the coordinates of its marker on the map. The columns
+    are kept as NumPy arrays and the names, aliases and codes are compiled into
+    indexes once, so resolving any number of values is a single vectorized lookup.
+
+    Parameters
+    ----------
+    frame : pandas.DataFrame
+        Frame with the ``code``, ``country``, ``aliases``, ``region``, ``latitud``
+        and ``longitud`` columns of ``geo.csv``.
+    version : str
+        Identifier of the content of the table, for cache keys and manifests.
+    """
+
+    def __init__(self, frame, version):
+        self.version = version
+        self.codes = frame["code"].to_numpy(dtype=object)
+        self.countries = frame["country"].to_numpy(dtype=object)
+        self.regions = frame["region"].to_numpy(dtype=object)
+        self.coordinates = frame[["latitud", "longitud"]].to_numpy(dtype=float)
+
+        keys = []
+        rows = []
+        for row, (country, aliases) in enumerate(zip(self.countries, frame["aliases"])):
+            names = [country, *(aliases.split(ALIAS_SEPARATOR) if aliases else [])]
+            keys.extend(names)
+            rows.extend([row] * len(names))
+        self._names = pd.Index(keys)
+        self._name_rows = np.asarray(rows, dtype=np.intp)
+        self._codes = pd.Index(self.codes)
+        if not self._names.is_unique or not self._codes.is_unique:
+            raise ValueError("Country codes, names and aliases must be unique")
+
+    @classmethod
+    def from_csv(cls, path=GEO_FILE):
+        path = Path(path)
+        # Read as text, so that codes such as NA (Namibia) are not taken as missing
+        frame = pd.read_csv(path, delimiter=";", dtype=str, keep_default_na=False)
+        for column in ("latitud", "longitud"):
+            frame[column] = pd.to_numeric(frame[column].replace("", np.nan))
+        version = hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+        return cls(frame, version)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def find(self, names):
+        """Row of each of ``names``, looked up by canonical name or alias, or -1."""
+        positions = self._names.get_indexer(pd.Index(names, dtype=object))
+        return np.where(positions >= 0, self._name_rows[positions], -1)
+
+    def find_codes(self, codes):
+        """Row of each of ``codes``, or -1 for unknown codes."""
+        return self._codes.get_indexer(pd.Index(codes, dtype=object))
+
+    def locate(self, names):
+        """Coordinates of ``names`` on the map.
+
+        Returns
+        -------
+        tuple
+            Boolean mask of the names that have coordinates in the table, and an
+            array with the latitude and longitude of each of them.
+        """
+        rows = self.find(names)
+        located = rows >= 0
+        located[located] = ~np.isnan(self.coordinates[rows[located]]).any(axis=1)
+        return located, self.coordinates[rows[located]]
+
+    def take(self, column, rows, default):
+        """Values of a 1-D ``column`` at ``rows``, with ``default`` where a row is -1."""
+        rows = np.asarray(rows)
+        return np.where(rows >= 0, column[rows], default)
+
+
+@functools.lru_cache(maxsize=None)
+def get_geo_table(path=GEO_FILE):
+    """Return the process-wide lookup table of the countries in ``path``."""
+    return GeoTable.from_csv(path)
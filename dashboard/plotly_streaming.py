@@ -1,16 +1,65 @@
 import functools
+import hashlib
 import json
 
+import numpy as np
+import pandas as pd
+import plotly
 import plotly.graph_objects as go
+from plotly.basedatatypes import BaseFigure
 from shinywidgets import render_widget
 
 from shiny import reactive
 
 
 # Return a hash of an arbitrary object, including nested dicts, lists, and numpy/pandas
-# data structures. Uses json.dumps() internally.
+# data structures. NumPy and pandas objects are hashed from their raw buffers together
+# with their dtype and shape, so the cost is linear in their size. The hash is a hex
+# digest, so it is the same for equal objects across processes.
 def _hash_anything(obj):
-    return hash(json.dumps(obj, sort_keys=True, default=_to_json_repr))
+    hasher = hashlib.blake2b(digest_size=16)
+    _update_hash(hasher, obj)
+    return hasher.hexdigest()
+
+
+def _update_hash(hasher, obj):
+    # Every value is prefixed by a tag for its type, so that e.g. 1, 1.0, True and "1"
+    # have different hashes
+    if obj is None or isinstance(obj, (bool, int, float, complex, str)):
+        hasher.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        hasher.update(b"bytes:%d:" % len(obj))
+        hasher.update(obj)
+    elif isinstance(obj, np.generic):
+        _update_hash(hasher, np.asarray(obj))
+    elif isinstance(obj, np.ndarray):
+        hasher.update(f"ndarray:{obj.dtype.str}:{obj.shape};".encode())
+        if obj.dtype.hasobject:
+            _update_hash(hasher, obj.tolist())
+        else:
+            hasher.update(np.ascontiguousarray(obj).view(np.uint8).data)
+    elif isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        hasher.update(f"{type(obj).__name__}:{obj.shape};".encode())
+        if isinstance(obj, pd.DataFrame):
+            _update_hash(hasher, obj.columns)
+            _update_hash(hasher, [str(dtype) for dtype in obj.dtypes])
+        else:
+            _update_hash(hasher, [obj.name, str(obj.dtype)])
+        if not isinstance(obj, pd.Index):
+            _update_hash(hasher, obj.index)
+        # One 64-bit hash per row, computed by pandas in vectorized code
+        _update_hash(hasher, pd.util.hash_pandas_object(obj, index=False).to_numpy())
+    elif isinstance(obj, dict):
+        hasher.update(b"dict:%d;" % len(obj))
+        for key, value in sorted(obj.items(), key=lambda item: repr(item[0])):
+            _update_hash(hasher, key)
+            _update_hash(hasher, value)
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(f"{type(obj).__name__}:{len(obj)};".encode())
+        for value in obj:
+            _update_hash(hasher, value)
+    else:
+        _update_hash(hasher, _to_json_repr(obj))
 
 
 def _to_json_repr(obj):
@@ -26,27 +75,121 @@ def _to_json_repr(obj):
     raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
 
 
+def _values_equal(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        a, b = np.asarray(a), np.asarray(b)
+        return a.shape == b.shape and bool(np.all(a == b))
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_values_equal(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+# Return the properties of `new` that differ from `old`, as a nested dict of the
+# changed property paths. Properties that are missing from `new` are set to None,
+# which resets them to their default value.
+def _diff_properties(old, new):
+    changes = {}
+    for key in new.keys() | old.keys():
+        if key not in new:
+            changes[key] = None
+        elif key not in old:
+            changes[key] = new[key]
+        elif isinstance(old[key], dict) and isinstance(new[key], dict):
+            nested = _diff_properties(old[key], new[key])
+            if nested:
+                changes[key] = nested
+        elif not _values_equal(old[key], new[key]):
+            changes[key] = new[key]
+    return changes
+
+
+# Flatten nested property changes into the dotted paths of a Plotly relayout, e.g.
+# {"font": {"color": "red"}} into {"font.color": "red"}.
+def _property_paths(changes, prefix=""):
+    paths = {}
+    for key, value in changes.items():
+        if isinstance(value, dict) and value:
+            paths.update(_property_paths(value, f"{prefix}{key}."))
+        else:
+            paths[f"{prefix}{key}"] = value
+    return paths
+
+
+# Version of plotly the private API used by _relayout() was checked against, the one
+# pinned in requirements.txt. Other versions fall back to the public, slower API.
+_RELAYOUT_PLOTLY_VERSION = "5.22.0"
+
+
+def _relayout(widget, changes):
+    """Apply the layout changes of a widget and send them to the browser at once.
+
+    update_layout() and plotly_relayout() check every changed property against the
+    layout, whose template is large, which takes longer than sending the whole
+    template. The changes come from the diff of two figures that were already
+    validated, so they are set in the layout of the widget as they are, using the
+    same private plotly calls as plotly_relayout() without the checks.
+    """
+    paths = _property_paths(changes)
+    if plotly.__version__ != _RELAYOUT_PLOTLY_VERSION:
+        widget.plotly_relayout(paths)
+        return
+    for path, value in paths.items():
+        BaseFigure._set_in(widget._layout, path, value)
+    widget._send_relayout_msg(paths)
+
+
+# Figures can be returned either as Figure objects or as the dict of one (e.g. a
+# cached one), which is diffed as is.
+def _figure_dict(fig):
+    return fig if isinstance(fig, dict) else fig.to_dict()
+
+
+def _same_traces(old, new):
+    """Whether two lists of trace dicts have the same number and types of traces."""
+    if len(old) != len(new):
+        return False
+    return all(
+        a.get("type", "scatter") == b.get("type", "scatter") for a, b in zip(old, new)
+    )
+
+
+def _figure_widget(fig):
+    # The widget must be validated even when the figure already was: the traces of
+    # a widget built with _validate=False do not send their later updates to the
+    # browser
+    return go.FigureWidget(fig)
+
+
+def _on_click(traces, callback):
+    if callback is not None:
+        for trace in traces:
+            trace.on_click(callback)
+
+
 def render_plotly_streaming(
-    fn=None, *, recreate_key=lambda: None, update=("layout", "data")
+    fn=None, *, recreate_key=lambda: None, update=("layout", "data"), on_click=None
 ):
     """Custom decorator for Plotly streaming plots. This is similar to
     shinywidgets.render_widget, except:
 
-    1. You return simply a Figure, not FigureWidget.
+    1. You return simply a Figure (or the dict of one), not FigureWidget.
     2. On reactive invalidation, the figure is updated in-place, rather than recreated
-       from scratch.
+       from scratch. Only the properties that changed since the previous figure are
+       sent to the client, and nothing is sent if the figure did not change.
 
     Parameters
     ----------
     recreate_key : callable, optional
         A function that returns a hashable object. If the value returned by this
-        function changes, the plot will be recreated from scratch. This is useful for
-        changes that render_plotly_streaming can't handle well, such as changing the
-        number of traces in a plot.
+        function changes, the plot will be recreated from scratch. Changes to the
+        number or types of traces are handled by replacing all the traces.
+    on_click : callable, optional
+        Called as ``on_click(trace, points, state)`` when a point of any trace of the
+        plot is clicked in the browser, like the callbacks of ``trace.on_click()``.
     """
 
     if fn is not None:
-        return render_plotly_streaming(recreate_key=recreate_key)(fn)
+        return render_plotly_streaming(recreate_key=recreate_key, on_click=on_click)(fn)
 
     def decorator(func):
         @deduplicate
@@ -60,17 +203,48 @@ def render_plotly_streaming(
 
             with reactive.isolate():
                 fig = func()
-                widget = go.FigureWidget(fig)
+                widget = _figure_widget(fig)
+            _on_click(widget.data, on_click)
+
+            previous = {"figure": _figure_dict(fig)}
 
             @reactive.Effect
             def update_plotly_data():
-                f_new = func()
+                f_new = _figure_dict(func())
+                f_old = previous["figure"]
+                previous["figure"] = f_new
+
+                layout_changes = {}
+                if "layout" in update:
+                    layout_changes = _diff_properties(
+                        f_old.get("layout", {}), f_new.get("layout", {})
+                    )
+                trace_changes = []
+                if "data" in update:
+                    if not _same_traces(f_old["data"], f_new["data"]):
+                        # Traces can not be diffed against traces of another type, so
+                        # they are all replaced
+                        widget.data = ()
+                        widget.add_traces(f_new["data"])
+                        _on_click(widget.data, on_click)
+                    else:
+                        trace_changes = [
+                            _diff_properties(old, new)
+                            for old, new in zip(f_old["data"], f_new["data"])
+                        ]
+                if not layout_changes and not any(trace_changes):
+                    return
+
+                # Only the properties that differ are sent, even within the template,
+                # which also keeps the margin shinywidgets sets on the template of
+                # the widget
+                if layout_changes:
+                    _relayout(widget, layout_changes)
+
                 with widget.batch_update():
-                    if "layout" in update:
-                        widget.update_layout(f_new.layout)
-                    if "data" in update:
-                        for old, new in zip(widget.data, f_new.data):
-                            old.update(new)
+                    for trace, changes in zip(widget.data, trace_changes):
+                        if changes:
+                            trace.update(changes)
 
             reactive.get_current_context().on_invalidate(update_plotly_data.destroy)
 
@@ -0,0 +1,85 @@
+import time
+
+from shiny import ui
+
+
+class ThrottledProgress:
+    """Progress bar that coalesces its updates before sending them to the browser.
+
+    Every call to ``ui.Progress.set()`` sends a message to the session, so reporting
+    each step of a loop over many items sends as many messages as items. This wraps
+    a ``ui.Progress`` with the same ``set()`` and ``inc()`` methods, but an update is
+    only sent once at least ``interval`` seconds have passed and the value moved by at
+    least ``min_step`` since the last one. Updates in between are merged and sent with
+    the next one, and dropped if the bar is closed first.
+
+    Parameters
+    ----------
+    min, max : int
+        Values of the start and of the end of the progress bar.
+    interval : float
+        Minimum number of seconds between two updates.
+    min_step : float
+        Minimum change of the value between two updates, in units of ``min`` and
+        ``max``.
+    session : shiny.Session, optional
+        Session to show the progress bar in, the current session by default.
+    """
+
+    def __init__(self, min=0, max=1, interval=0.25, min_step=0, session=None):
+        self.interval = interval
+        self.min_step = min_step
+        self._progress = ui.Progress(min=min, max=max, session=session)
+        self._pending = {}
+        self._sent_at = None
+        self._sent_value = None
+
+    @property
+    def value(self):
+        return self._pending.get("value", self._progress.value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exctype, excinst, exctb):
+        self.close()
+
+    def set(self, value=None, message=None, detail=None):
+        """Update the progress bar, like ``ui.Progress.set()``.
+
+        The message and the detail are kept until they are set again, so an update
+        that only sets the value does not hide them.
+        """
+        update = {"value": value, "message": message, "detail": detail}
+        self._pending.update((k, v) for k, v in update.items() if v is not None)
+        if self._due():
+            self.flush()
+
+    def inc(self, amount=1, message=None, detail=None):
+        """Increment the value of the progress bar by ``amount``."""
+        value = self.value if self.value is not None else self._progress.min
+        self.set(min(value + amount, self._progress.max), message, detail)
+
+    def flush(self):
+        """Send the pending update now."""
+        if not self._pending:
+            return
+        self._progress.set(**self._pending)
+        self._sent_at = time.monotonic()
+        self._sent_value = self._pending.get("value", self._sent_value)
+        self._pending = {}
+
+    def close(self):
+        self._pending = {}
+        self._progress.close()
+
+    def _due(self):
+        # The first update is always sent, so that the bar shows up right away
+        if self._sent_at is None:
+            return True
+        if time.monotonic() - self._sent_at < self.interval:
+            return False
+        value = self._pending.get("value")
+        if value is None or self._sent_value is None:
+            return True
+        return abs(value - self._sent_value) >= self.min_step
@@ -0,0 +1,72 @@
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """Placeholder for a module that is imported when one of its attributes is used.
+
+    Unlike ``importlib.util.LazyLoader``, the placeholder carries the module spec, so
+    ``import name`` statements elsewhere do not trigger the import by themselves.
+    """
+
+    def __init__(self, spec):
+        super().__init__(spec.name)
+        self.__spec__ = spec
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def __getattr__(self, attr):
+        with self.__dict__["_lazy_lock"]:
+            if sys.modules.get(self.__name__) is self:
+                del sys.modules[self.__name__]
+                try:
+                    module = importlib.import_module(self.__name__)
+                except BaseException:
+                    sys.modules[self.__name__] = self
+                    raise
+                # Names bound to the placeholder keep working, without the detour
+                self.__dict__.update(module.__dict__)
+        module = sys.modules[self.__name__]
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """Register ``name`` in ``sys.modules`` without importing it yet.
+
+    The module is imported the first time one of its attributes is used, so
+    ``import name`` statements anywhere in the app are free until it is needed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    parent, _, child = name.rpartition(".")
+    if parent:
+        importlib.import_module(parent)
+    spec = importlib.util.find_spec(name)
+    module = _LazyModule(spec)
+    sys.modules[name] = module
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+class StartupTimer:
+    """Measures how long each phase of the app startup takes."""
+
+    def __init__(self):
+        self.start = self._last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        total = self._last - self.start
+        details = ", ".join(
+            f"{phase} {seconds:.2f} s" for phase, seconds in self.phases
+        )
+        print(f"Dashboard ready in {total:.2f} s ({details})", file=sys.stderr)
@@ -0,0 +1,120 @@
+import math
+from html import escape
+
+# Font of the Plotly templates used by the dashboard
+FONT_FAMILY = '"Open Sans", verdana, arial, sans-serif'
+
+# Vertical space taken by the two lines of a slice label, in pixels
+LABEL_HEIGHT = 36
+
+
+def _point(cx, cy, radius, angle):
+    return cx + radius * math.sin(angle), cy - radius * math.cos(angle)
+
+
+def _slice_path(cx, cy, outer, inner, start, end):
+    """SVG path of the ring slice between the angles ``start`` and ``end``.
+
+    Angles are in radians, clockwise from 12 o'clock. A slice can not be drawn as a
+    single arc when it covers the whole ring, so it is drawn as two halves.
+    """
+    if end - start >= 2 * math.pi - 1e-9:
+        middle = start + math.pi
+        return _slice_path(cx, cy, outer, inner, start, middle) + _slice_path(
+            cx, cy, outer, inner, middle, end
+        )
+    large = int(end - start > math.pi)
+    x0, y0 = _point(cx, cy, outer, start)
+    x1, y1 = _point(cx, cy, outer, end)
+    x2, y2 = _point(cx, cy, inner, end)
+    x3, y3 = _point(cx, cy, inner, start)
+    return (
+        f"M{x0:.2f},{y0:.2f}A{outer:.2f},{outer:.2f} 0 {large} 1 {x1:.2f},{y1:.2f}"
+        f"L{x2:.2f},{y2:.2f}A{inner:.2f},{inner:.2f} 0 {large} 0 {x3:.2f},{y3:.2f}Z"
+    )
+
+
+def donut_chart_svg(
+    labels,
+    values,
+    colors,
+    title,
+    background="white",
+    font_color="#2a3f5f",
+    width=600,
+    height=400,
+    hole=0.3,
+):
+    """Render a donut chart as a standalone SVG document.
+
+    Slices are sorted by decreasing value and drawn counterclockwise from 12 o'clock
+    like Plotly pie charts, with their label and percentage outside of the ring and
+    their count as a tooltip. The chart is plain markup, so it needs neither
+    plotly.js nor a widget to be shown.
+
+    Parameters
+    ----------
+    labels, values : sequence
+        Label and value of each slice.
+    colors : sequence of str
+        Color of each slice, in the order of ``labels``.
+    title : str
+        Title shown above the chart.
+    background, font_color : str
+        Colors of the background and of the text.
+    width, height : int
+        Size of the chart in pixels.
+    hole : float
+        Fraction of the radius cut out of the middle of the pie.
+    """
+    total = sum(values)
+    cx, cy = width / 2, height / 2 + 20
+    outer = min(width, height) / 2 - 70
+    inner = outer * hole
+    slices = sorted(zip(labels, values, colors), key=lambda item: item[1], reverse=True)
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f"viewBox=\"0 0 {width} {height}\" font-family='{FONT_FAMILY}' "
+        f'fill="{font_color}">',
+        f'<rect width="100%" height="100%" fill="{background}"></rect>',
+        f'<text x="{cx:.0f}" y="36" text-anchor="middle" font-size="20">'
+        f"{escape(str(title))}</text>",
+    ]
+    # Plotly draws the first slice counterclockwise from 12 o'clock, so it ends at
+    # the angle 0 and every other slice ends where the previous one started
+    end = 2 * math.pi
+    texts = []
+    for label, value, color in slices:
+        if not total or not value:
+            continue
+        start = end - 2 * math.pi * value / total
+        path = _slice_path(cx, cy, outer, inner, start, end)
+        label = escape(str(label))
+        parts.append(
+            f'<path d="{path}" fill="{color}" stroke="{background}">'
+            f"<title>{label}: {value}</title></path>"
+        )
+        middle = (start + end) / 2
+        x, y = _point(cx, cy, outer + 14, middle)
+        # Labels at the very top or bottom are centered on the slice
+        sine = math.sin(middle)
+        side = 0 if abs(sine) < 0.1 else int(math.copysign(1, sine))
+        texts.append([side, x, y, label, f"{value / total:.1%}"])
+        end = start
+
+    # Labels on the same side of the chart are pushed down so that they do not
+    # overlap, as each of them takes two lines
+    for side in (-1, 0, 1):
+        previous = -math.inf
+        for text in sorted((t for t in texts if t[0] == side), key=lambda t: t[2]):
+            text[2] = previous = max(text[2], previous + LABEL_HEIGHT)
+    anchors = {-1: "end", 0: "middle", 1: "start"}
+    for side, x, y, label, percent in texts:
+        parts.append(
+            f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="{anchors[side]}" '
+            f'font-size="15">{label}<tspan x="{x:.1f}" dy="1.2em">{percent}</tspan>'
+            "</text>"
+        )
+    parts.append("</svg>")
+    return "".join(parts)
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the dashboard.
+
+Drives the Shiny app headlessly against the bundled CSVs and measures the import
+time, session startup, chart render, theme toggle and map render latency, together
+with the peak memory and the number of messages (and widget messages) sent to the
+browser. Results can be saved as a baseline and compared against it, so regressions
+show up in review. Message counts and sizes are deterministic and stored in the
+committed baseline. Timings and memory are only comparable between runs on the same
+machine, so they are stored in a local baseline that is not committed, and only
+compared once one was saved with --save.
+
+Usage:
+    python benchmark_dashboard.py                 # Run and print the results
+    python benchmark_dashboard.py --save          # Also store them as the baseline
+    python benchmark_dashboard.py --compare       # Exit with 1 on regressions
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+DASHBOARD_DIR = Path(__file__).resolve().parent.parent / "dashboard"
+BASELINE_FILE = Path(__file__).resolve().parent / "benchmark_baseline.json"
+LOCAL_BASELINE_FILE = Path(__file__).resolve().parent / "benchmark_baseline.local.json"
+
+# Metrics that are the same on every machine, stored in the committed baseline
+DETERMINISTIC_METRICS = ("messages", "widget_messages", "bytes")
+
+sys.path.insert(0, str(DASHBOARD_DIR))
+
+from shiny._connection import MockConnection  # noqa: E402
+from shiny.session._session import AppSession  # noqa: E402
+
+# ipyleaflet warns on every map build that CartoDB tiles need an API key
+warnings.filterwarnings("ignore", message="CartoDB tiles now require an API key")
+
+CHART_OUTPUTS = ["plot_0", "plot_1", "plot_2", "plot_3", "plot_4"]
+MAP_OUTPUTS = ["map_full"]
+
+# Relative slowdown (and absolute slowdown, in seconds) allowed before a timing is
+# reported as a regression. Message counts must not grow at all.
+TIME_TOLERANCE = 0.25
+TIME_FLOOR = 0.02
+SIZE_TOLERANCE = 0.05
+
+
+class RecordingConnection(MockConnection):
+    """Mock websocket that keeps every message sent to the browser."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.sent_at = None
+
+    async def send(self, message):
+        self.messages.append(message)
+        self.sent_at = time.perf_counter()
+
+
+class BenchmarkSession:
+    """Headless session of the dashboard app."""
+
+    def __init__(self, app, session_id):
+        self.app = app
+        self.conn = RecordingConnection()
+        self.session = AppSession(app, session_id, self.conn)
+        app._sessions[session_id] = self.session
+        self.task = asyncio.create_task(self.session._run())
+
+    async def send(self, method, data):
+        """Send a message from the browser and wait until the server is done with it.
+
+        Returns the messages sent back to the browser in the meantime.
+        """
+        start = len(self.conn.messages)
+        self.conn.cause_receive(json.dumps({"method": method, "data": data}))
+        # Each flush ends with a "values" message, after the outputs and widget
+        # messages have been sent
+        while not any('"values"' in m for m in self.conn.messages[start:]):
+            await asyncio.sleep(0.001)
+        return self.conn.messages[start:]
+
+    async def start(self, outputs, dark_mode="light", color_theme="Custom", year=None):
+        from dataset import get_partitions
+
+        if year is None:
+            year = get_partitions().latest_year
+        data = {"dark_mode": dark_mode, "color_theme": color_theme, "year": str(year)}
+        for output in outputs:
+            data[f".clientdata_output_{output}_hidden"] = False
+        return await self.send("init", data)
+
+    async def update(self, **inputs):
+        return await self.send("update", inputs)
+
+    async def settle(self, quiet=0.2):
+        """Wait until nothing was sent to the browser for ``quiet`` seconds.
+
+        The map layer is loaded and streamed onto the map after the first flush, so
+        its messages keep coming once ``start()`` returned. Returns the time the last
+        message was sent.
+        """
+        while time.perf_counter() - self.conn.sent_at < quiet:
+            await asyncio.sleep(0.01)
+        return self.conn.sent_at
+
+    async def close(self):
+        self.conn.cause_disconnect()
+        await self.task
+
+
+def count_messages(messages):
+    widget_messages = 0
+    for message in messages:
+        custom = json.loads(message).get("custom", {})
+        widget_messages += sum(1 for key in custom if key.startswith("shinywidgets"))
+    return {
+        "messages": len(messages),
+        "widget_messages": widget_messages,
+        "bytes": sum(len(message) for message in messages),
+    }
+
+
+def clear_caches():
+    from cache import figure_cache, map_cache
+
+    figure_cache.clear()
+    map_cache.clear()
+
+
+async def scenario_session_startup(app, cold):
+    if cold:
+        clear_caches()
+    session = BenchmarkSession(app, "benchmark")
+    start = time.perf_counter()
+    messages = await session.start(CHART_OUTPUTS)
+    seconds = time.perf_counter() - start
+    await session.close()
+    return seconds, messages
+
+
+async def scenario_theme_toggle(app, inputs):
+    session = BenchmarkSession(app, "benchmark")
+    await session.start(CHART_OUTPUTS)
+    start = time.perf_counter()
+    messages = await session.update(**inputs)
+    seconds = time.perf_counter() - start
+    await session.close()
+    return seconds, messages
+
+
+async def scenario_map_render(app, map_layer, cold):
+    import app as app_module
+
+    if cold:
+        clear_caches()
+    app_module.MAP_LAYER = map_layer
+    try:
+        session = BenchmarkSession(app, "benchmark")
+        start = time.perf_counter()
+        await session.start(MAP_OUTPUTS)
+        seconds = await session.settle() - start
+        messages = session.conn.messages
+        await session.close()
+    finally:
+        app_module.MAP_LAYER = os.environ.get("CB_DASHBOARD_MAP_LAYER", "markers")
+    return seconds, messages
+
+
+SCENARIOS = {
+    "session_startup_cold": lambda app: scenario_session_startup(app, cold=True),
+    "session_startup_warm": lambda app: scenario_session_startup(app, cold=False),
+    "color_theme_toggle": lambda app: scenario_theme_toggle(
+        app, {"color_theme": "RdBu"}
+    ),
+    "dark_mode_toggle": lambda app: scenario_theme_toggle(app, {"dark_mode": "dark"}),
+    "map_render_markers_cold": lambda app: scenario_map_render(app, "markers", True),
+    "map_render_markers_warm": lambda app: scenario_map_render(app, "markers", False),
+    "map_render_geojson_cold": lambda app: scenario_map_render(app, "geojson", True),
+    "map_render_geojson_warm": lambda app: scenario_map_render(app, "geojson", False),
+}
+
+
+def measure_import():
+    # Measured in a fresh interpreter, so that nothing is imported or cached yet
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    times = []
+    for _ in range(3):
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=DASHBOARD_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return {"seconds": round(statistics.median(times), 4)}
+
+
+def run_benchmarks(repeat, selected):
+    import app as app_module
+
+    results = {}
+    # Shiny's reactive lock is bound to the first event loop that waits on it, so
+    # every scenario runs on the same loop
+    loop = asyncio.new_event_loop()
+    if "app_import" in selected:
+        print("Running app_import...")
+        results["app_import"] = measure_import()
+
+    for name, scenario in SCENARIOS.items():
+        if name not in selected:
+            continue
+        print(f"Running {name}...")
+        times = []
+        for _ in range(repeat):
+            seconds, messages = loop.run_until_complete(scenario(app_module.app))
+            times.append(seconds)
+
+        # Peak memory is measured in a separate run, since tracing slows it down
+        tracemalloc.start()
+        loop.run_until_complete(scenario(app_module.app))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            "seconds": round(statistics.median(times), 4),
+            "peak_memory_mb": round(peak / 1024 / 1024, 2),
+            **count_messages(messages),
+        }
+    loop.close()
+    return results
+
+
+def split_metrics(results):
+    """Split results into their deterministic and their machine-dependent metrics."""
+    deterministic, local = {}, {}
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            target = deterministic if metric in DETERMINISTIC_METRICS else local
+            target.setdefault(name, {})[metric] = value
+    return deterministic, local
+
+
+def read_baseline(path):
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def merge_baselines(*baselines):
+    merged = {}
+    for baseline in baselines:
+        for name, metrics in baseline.items():
+            merged[name] = {**merged.get(name, {}), **metrics}
+    return merged
+
+
+def find_regressions(results, baseline):
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, value in metrics.items():
+            if metric not in base:
+                continue
+            before = base[metric]
+            if metric == "seconds":
+                slower = value - before
+                regressed = slower > TIME_FLOOR and value > before * (
+                    1 + TIME_TOLERANCE
+                )
+            elif metric in ("messages", "widget_messages"):
+                regressed = value > before
+            else:
+                regressed = value > before * (1 + SIZE_TOLERANCE)
+            if regressed:
+                regressions.append(f"{name}.{metric}: {before} -> {value}")
+    return regressions
+
+
+def print_results(results, baseline):
+    columns = ["seconds", "peak_memory_mb", "messages", "widget_messages", "bytes"]
+    print(f"\n{'scenario':<26}" + "".join(f"{column:>18}" for column in columns))
+    for name, metrics in results.items():
+        cells = []
+        for column in columns:
+            value = metrics.get(column)
+            if value is None:
+                cells.append(f"{'-':>18}")
+                continue
+            text = f"{value:.3f}" if column == "seconds" else f"{value}"
+            before = baseline.get(name, {}).get(column)
+            if before is not None and before != value:
+                text += f" ({before:.3g})" if column == "seconds" else f" ({before})"
+            cells.append(f"{text:>18}")
+        print(f"{name:<26}" + "".join(cells))
+    if baseline:
+        print("\nBaseline values are shown in parentheses when they differ.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=["app_import", *SCENARIOS],
+        help="Run only these scenarios",
+    )
+    parser.add_argument("--save", action="store_true", help="Store as the baseline")
+    parser.add_argument(
+        "--compare", action="store_true", help="Exit with 1 on regressions"
+    )
+    parser.add_argument("--output", type=Path, help="Write the results to a file")
+    args = parser.parse_args()
+
+    shared = read_baseline(BASELINE_FILE)
+    local = read_baseline(LOCAL_BASELINE_FILE)
+    baseline = merge_baselines(shared, local)
+
+    results = run_benchmarks(args.repeat, args.only or ["app_import", *SCENARIOS])
+    print_results(results, baseline)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    if args.save:
+        new_shared, new_local = split_metrics(results)
+        for path, saved, new in [
+            (BASELINE_FILE, shared, new_shared),
+            (LOCAL_BASELINE_FILE, local, new_local),
+        ]:
+            path.write_text(json.dumps({**saved, **new}, indent=2) + "\n")
+            print(f"\nBaseline saved to {path}")
+    if args.compare:
+        regressions = find_regressions(results, baseline)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline!")
+
+
+if __name__ == "__main__":
+    main()
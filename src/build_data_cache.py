@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Script to build the binary cache of the CB data before starting the dashboard.
+
+Every yearly snapshot is parsed into the memory-mappable sidecar of the dataset
+(the dictionary codes of every column in dashboard/data/.cache/), together with
+its count cube and the summary file read by the value boxes, so that the worker
+processes of the dashboard only map the files read-only and share a single copy
+of them in the page cache, instead of each parsing the CSV and counting the rows
+on its own. Workers build any missing part themselves, so running this script is
+optional, but it keeps them from doing the same work at the same time when they
+are all started together.
+
+Usage:
+    python build_data_cache.py               # Build the cache of every snapshot
+    python build_data_cache.py --year 2025   # Build the cache of one snapshot
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from dataset import get_partitions  # noqa: E402
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in path.rglob("*") if entry.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument(
+        "--year", type=int, action="append", help="Snapshot to build (default: all)"
+    )
+    args = parser.parse_args()
+
+    partitions = get_partitions()
+    for year in args.year or partitions.years:
+        start = time.perf_counter()
+        dataset = partitions[year]
+        dataset.cube
+        partitions.summary(year)
+        seconds = time.perf_counter() - start
+        if not (dataset.sidecar / "cube").exists():
+            print(f"❌ {year}: the cache could not be written next to the data")
+            sys.exit(1)
+        size = directory_size(dataset.sidecar) / 1024
+        print(f"{year}: {len(dataset)} records, {size:.0f} KB in {seconds:.2f} s")
+        print(f"  {dataset.sidecar}")
+
+    print("\n✅ Cache ready!")
+
+
+if __name__ == "__main__":
+    main()
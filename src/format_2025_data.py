@@ -3,223 +3,33 @@
 Script to format the 2025 CB data to match the 2024 format.
 """
 
+import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 import re
 
-# Country name mappings to standardize inconsistencies
-COUNTRY_MAPPINGS = {
-    # Remove country codes in parentheses and standardize names
-    'India (IN)': 'India',
-    'United States of America (US)': 'USA',
-    'United States of America': 'USA',
-    'Germany (DE)': 'Germany',
-    'Nepal (NP)': 'Nepal',
-    'France (FR)': 'France',
-    'Nigeria (NG)': 'Nigeria',
-    'United Arab Emirates (AE)': 'United Arab Emirates',
-    'Spain (ES)': 'Spain',
-    'Italy (IT)': 'Italy',
-    'United Kingdom of Great Britain and Northern Ireland (GB)': 'UK',
-    'United Kingdom of Great Britain and Northern Ireland': 'UK',
-    'Philippines (PH)': 'Philippines',
-    'Pakistan (PK)': 'Pakistan',
-    'Egypt (EG)': 'Egypt',
-    'Malaysia (MY)': 'Malaysia',
-    'Canada (CA)': 'Canada',
-    'Australia (AU)': 'Australia',
-    'Bangladesh (BD)': 'Bangladesh',
-    'Japan (JP)': 'Japan',
-    'Indonesia (ID)': 'Indonesia',
-    'Qatar (QA)': 'Qatar',
-    'Kenya (KE)': 'Kenya',
-    'Kazakhstan (KZ)': 'Kazakhstan',
-    'Ukraine (UA)': 'Ukraine',
-    'Israel (IL)': 'Israel',
-    'Serbia (RS)': 'Serbia',
-    'Romania (RO)': 'Romania',
-    'Mexico (MX)': 'Mexico',
-    'Poland (PL)': 'Poland',
-    'Brazil (BR)': 'Brazil',
-    'Portugal (PT)': 'Portugal',
-    'Sweden (SE)': 'Sweden',
-    'New Zealand (NZ)': 'New Zealand',
-    'Hong Kong (HK)': 'Hong Kong',
-    'Viet Nam (VN)': 'Viet Nam',
-    'Switzerland (CH)': 'Switzerland',
-    'Sri Lanka (LK)': 'Sri Lanka',
-    'Republic of Korea (KR)': 'South Korea',
-    'Thailand (TH)': 'Thailand',
-    'Angola (AO)': 'Angola',
-    'Armenia (AM)': 'Armenia',
-    'Netherlands (NL)': 'Netherlands',
-    'Panama (PA)': 'Panama',
-    'Guatemala (GT)': 'Guatemala',
-    'Norway (NO)': 'Norway',
-    'Chile (CL)': 'Chile',
-    'Bolivia (BO)': 'Bolivia',
-    'Uganda (UG)': 'Uganda',
-    'Ghana (GH)': 'Ghana',
-    'Colombia (CO)': 'Colombia',
-    'Argentina (AR)': 'Argentina',
-    'Belgium (BE)': 'Belgium',
-    'Myanmar (MM)': 'Myanmar',
-    'Singapore (SG)': 'Singapore',
-    'South Africa (ZA)': 'South Africa',
-    'Ireland (IE)': 'Ireland',
-    'China (CN)': 'China',
-    'Uruguay (UY)': 'Uruguay',
-    'Georgia (GE)': 'Georgia',
-    'Cameroon (CM)': 'Cameroon',
-    'Ecuador (EC)': 'Ecuador',
-    'Zimbabwe (ZW)': 'Zimbabwe',
-    'El Salvador (SV)': 'El Salvador',
-    'Saudi Arabia (SA)': 'Saudi Arabia',
-    'Oman (OM)': 'Oman',
-    'Bosnia and Herzegovina (BA)': 'Bosnia and Herzegovina',
-    'Latvia (LV)': 'Latvia',
-    'Lithuania (LT)': 'Lithuania',
-    'Uzbekistan (UZ)': 'Uzbekistan',
-    'Albania (AL)': 'Albania',
-    'Hong Kong (S.A.R.)': 'Hong Kong',
-    'Peru (PE)': 'Peru',
-    'Tunisia (TN)': 'Tunisia',
-    'Lebanon (LB)': 'Lebanon',
-    'Slovenia (SI)': 'Slovenia',
-    'T√ºrkiye / Turkey (TR)': 'Turkey',
-    'Hungary (HU)': 'Hungary',
-    'Senegal (SN)': 'Senegal',
-    'Malta (MT)': 'Malta',
-    'Congo (CD)': 'Congo',
-    'Morocco (MA)': 'Morocco',
-    'Cyprus (CY)': 'Cyprus',
-    'Luxembourg (LU)': 'Luxembourg',
-    'Finland (FI)': 'Finland',
-    'San Marino (SM)': 'San Marino',
-    'Montenegro (ME)': 'Montenegro',
-    'Taiwan (TW)': 'Taiwan',
-    'Palestinian Territory': 'Palestine'
-}
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
 
-# Region mappings based on the 2024 data patterns
-REGION_MAPPINGS = {
-    'Australia': 'APJ',
-    'Bangladesh': 'APJ',
-    'Cambodia': 'APJ',
-    'India': 'APJ',
-    'Indonesia': 'APJ',
-    'Japan': 'APJ',
-    'Malaysia': 'APJ',
-    'Myanmar': 'APJ',
-    'Nepal': 'APJ',
-    'New Zealand': 'APJ',
-    'Pakistan': 'APJ',
-    'Philippines': 'APJ',
-    'Singapore': 'APJ',
-    'South Korea': 'APJ',
-    'Sri Lanka': 'APJ',
-    'Thailand': 'APJ',
-    'Viet Nam': 'APJ',
-    
-    'Austria': 'EMEA',
-    'Bahrain': 'EMEA',
-    'Belarus': 'EMEA',
-    'Belgium': 'EMEA',
-    'Benin': 'EMEA',
-    'Bosnia and Herzegovina': 'EMEA',
-    'Bulgaria': 'EMEA',
-    'Cameroon': 'EMEA',
-    'Cyprus': 'EMEA',
-    'Czech Republic': 'EMEA',
-    'Denmark': 'EMEA',
-    'Egypt': 'EMEA',
-    'Estonia': 'EMEA',
-    'Finland': 'EMEA',
-    'France': 'EMEA',
-    'Germany': 'EMEA',
-    'Ghana': 'EMEA',
-    'Hungary': 'EMEA',
-    'Iraq': 'EMEA',
-    'Ireland': 'EMEA',
-    'Israel': 'EMEA',
-    'Italy': 'EMEA',
-    'Jordan': 'EMEA',
-    'Kazakhstan': 'EMEA',
-    'Kenya': 'EMEA',
-    'Latvia': 'EMEA',
-    'Lebanon': 'EMEA',
-    'Lithuania': 'EMEA',
-    'Macedonia': 'EMEA',
-    'Montenegro': 'EMEA',
-    'Morocco': 'EMEA',
-    'Mozambique': 'EMEA',
-    'Netherlands': 'EMEA',
-    'Nigeria': 'EMEA',
-    'Norway': 'EMEA',
-    'Oman': 'EMEA',
-    'Palestine': 'EMEA',
-    'Poland': 'EMEA',
-    'Portugal': 'EMEA',
-    'Qatar': 'EMEA',
-    'Romania': 'EMEA',
-    'Russian Federation': 'EMEA',
-    'Saudi Arabia': 'EMEA',
-    'Serbia': 'EMEA',
-    'South Africa': 'EMEA',
-    'Spain': 'EMEA',
-    'Sweden': 'EMEA',
-    'Switzerland': 'EMEA',
-    'Turkey': 'EMEA',
-    'UK': 'EMEA',
-    'Ukraine': 'EMEA',
-    'United Arab Emirates': 'EMEA',
-    'Zimbabwe': 'EMEA',
-    
-    'Hong Kong': 'GCR',
-    'Taiwan': 'GCR',
-    'China': 'GCR',
-    
-    'Argentina': 'LATAM',
-    'Barbados': 'LATAM',
-    'Bolivia': 'LATAM',
-    'Brazil': 'LATAM',
-    'Chile': 'LATAM',
-    'Colombia': 'LATAM',
-    'Costa Rica': 'LATAM',
-    'Ecuador': 'LATAM',
-    'El Salvador': 'LATAM',
-    'Guatemala': 'LATAM',
-    'Mexico': 'LATAM',
-    'Nicaragua': 'LATAM',
-    'Panama': 'LATAM',
-    'Peru': 'LATAM',
-    'Uruguay': 'LATAM',
-    
-    'Bahamas': 'NAMER',
-    'Canada': 'NAMER',
-    'USA': 'NAMER',
-    
-    # Additional countries found in 2025 data
-    'Armenia': 'EMEA',
-    'Mauritius': 'EMEA',
-    'Uganda': 'EMEA',
-    'Greece': 'EMEA',
-    'Angola': 'EMEA',
-    'Georgia': 'EMEA',
-    'Belize': 'LATAM',
-    'Tunisia': 'EMEA',
-    'Uzbekistan': 'EMEA',
-    'Slovenia': 'EMEA',
-    'Slovakia': 'EMEA',
-    'Senegal': 'EMEA',
-    'Palestinian Territory': 'EMEA',
-    'Malta': 'EMEA',
-    'Congo': 'EMEA',
-    'Albania': 'EMEA',
-    'Algeria': 'EMEA',
-    'Luxembourg': 'EMEA',
-    'San Marino': 'EMEA',
-    'Republic of Moldova': 'EMEA',
-}
+from geo import get_geo_table  # noqa: E402
+
+INPUT_FILE = '../dashboard/data/anonymized_cb_data_2025_original.csv'
+OUTPUT_FILE = '../dashboard/data/anonymized_cb_data_2025.csv'
+
+# Country names, other spellings and regions come from the lookup table of the
+# dashboard (dashboard/data/geo.csv), keyed by ISO 3166-1 alpha-2 code. The 2025 export
+# writes most countries as "Name (XX)", which are resolved through their code; names
+# missing from the table are kept without the code, and get an UNKNOWN region
+
+# Trailing ISO code of a country name, e.g. "Spain (ES)"
+COUNTRY_CODE_PATTERN = re.compile(r'^\s*(?P<name>.*?)\s*\((?P<code>[A-Z]{2})\)\s*$')
 
 # Category mappings to standardize naming
 CATEGORY_MAPPINGS = {
@@ -236,83 +46,271 @@ CATEGORY_MAPPINGS = {
 
 def clean_country_name(country):
     """Clean and standardize country names."""
-    if country in COUNTRY_MAPPINGS:
-        return COUNTRY_MAPPINGS[country]
-    return country
+    return clean_country_names(pd.Series([country], dtype=object))[0]
 
 def get_region(country):
     """Get region for a country."""
-    return REGION_MAPPINGS.get(country, 'UNKNOWN')
+    return get_regions(pd.Series([country], dtype=object))[0]
 
 def clean_category(category):
     """Clean and standardize category names."""
     return CATEGORY_MAPPINGS.get(category, category)
 
-def main():
-    # Read the 2025 original data
-    print("Reading 2025 original data...")
-    # The file has semicolon header but comma-separated data, so we need to handle this
-    with open('../dashboard/data/anonymized_cb_data_2025_original.csv', 'r') as f:
-        lines = f.readlines()
-    
-    # Fix the header to use commas
-    lines[0] = lines[0].replace(';', ',')
-    
-    # Write to a temporary file
-    with open('temp_2025.csv', 'w') as f:
-        f.writelines(lines)
-    
-    df_2025 = pd.read_csv('temp_2025.csv')
-    
-    print(f"Original data shape: {df_2025.shape}")
-    print(f"Original columns: {df_2025.columns.tolist()}")
-    
-    # Clean the data
-    print("Cleaning data...")
-    
+def clean_country_names(countries):
+    """Vectorized clean_country_name over a Series of country names.
+
+    Names are resolved once per distinct value and then broadcast back to the rows, so
+    the cost depends on the number of distinct countries rather than of rows. A name is
+    looked up in the country table by name or alias first, then by its trailing ISO
+    code, then by name or alias again without the code, and otherwise kept without the
+    code.
+    """
+    geo = get_geo_table()
+    codes, uniques = pd.factorize(countries)
+    uniques = pd.Series(uniques, dtype=object)
+    parts = uniques.str.extract(COUNTRY_CODE_PATTERN)
+    names = parts['name'].fillna(uniques)
+    rows = geo.find(uniques)
+    rows = np.where(rows >= 0, rows, geo.find_codes(parts['code']))
+    rows = np.where(rows >= 0, rows, geo.find(names))
+    cleaned = pd.Series(geo.take(geo.countries, rows, names.to_numpy()), dtype=object)
+    # Missing values have code -1, which reindexes to NaN
+    return pd.Series(
+        cleaned.reindex(codes).to_numpy(), index=countries.index, name=countries.name
+    )
+
+def get_regions(countries):
+    """Vectorized get_region over a Series of cleaned country names."""
+    geo = get_geo_table()
+    regions = geo.take(geo.regions, geo.find(countries), '')
+    # Countries without a region in the lookup table are reported by main()
+    regions[regions == ''] = 'UNKNOWN'
+    return pd.Series(regions, index=countries.index, name=countries.name)
+
+def read_header(input_file):
+    """Column names of the original export.
+
+    The header is separated by semicolons while the data rows use commas, so it is
+    parsed on its own and the rows are read with explicit column names.
+    """
+    with open(input_file, 'r', encoding='utf-8-sig') as f:
+        return f.readline().strip().split(';')
+
+def read_raw_chunks(input_file, chunksize):
+    """Iterate over the raw bytes of the data rows of the original export.
+
+    Each chunk holds up to chunksize lines, so its content hash only changes when
+    one of its rows does. None of the fields are quoted, so every line is a row.
+    """
+    with open(input_file, 'rb') as f:
+        f.readline()  # Header
+        while True:
+            lines = list(itertools.islice(f, chunksize))
+            if not lines:
+                return
+            yield b''.join(lines)
+
+def parse_chunk(raw, columns):
+    """Parse the raw bytes of a chunk of data rows."""
+    return pd.read_csv(io.BytesIO(raw), header=None, names=columns, dtype=str)
+
+def get_manifest_path(output_file):
+    """The manifest is stored next to the output, e.g. anonymized_cb_data_2025.manifest.json."""
+    return Path(output_file).with_suffix('.manifest.json')
+
+def get_rules_hash(columns, chunksize):
+    """Hash of everything besides the input that affects the output."""
+    rules = [columns, chunksize, get_geo_table().version]
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+
+def read_manifest(output_file):
+    """Manifest of the previous run, or None if there is none."""
+    try:
+        return json.loads(get_manifest_path(output_file).read_text())
+    except (OSError, ValueError):
+        return None
+
+def can_reuse_output(manifest, output_file, rules_hash):
+    """Whether the output of the previous run can be extended.
+
+    It can only be when it was written with the same rules and has not been modified
+    since.
+    """
+    try:
+        stat = os.stat(output_file)
+    except OSError:
+        return False
+    return (
+        manifest.get('rules') == rules_hash
+        and manifest.get('size') == stat.st_size
+        and manifest.get('mtime_ns') == stat.st_mtime_ns
+    )
+
+def write_manifest(output_file, rules_hash, chunks, data_version):
+    """Record the chunks of the output and a version that changes with its content."""
+    stat = os.stat(output_file)
+    content_hash = hashlib.sha1(''.join(c['output_hash'] for c in chunks).encode())
+    manifest = {
+        'data_version': data_version,
+        # Used by the dashboard as the version of the data file, in cache keys
+        'version': f"{data_version}-{content_hash.hexdigest()[:8]}",
+        'rules': rules_hash,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'chunks': chunks,
+    }
+    get_manifest_path(output_file).write_text(json.dumps(manifest, indent=2) + '\n')
+    return manifest
+
+def clean_chunk(chunk):
+    """Clean one chunk of the original export into the 2024 format."""
+    # Remove invalid entries
+    chunk = chunk[chunk['category'] != 'A'].copy()
+
     # Clean country names
-    df_2025['country'] = df_2025['country'].apply(clean_country_name)
-    
+    chunk['country'] = clean_country_names(chunk['country'])
+
     # Clean categories
-    # df_2025['category'] = df_2025['category'].apply(clean_category)
-    
-    # Fix specific category issues
-    df_2025 = df_2025[df_2025['category'] != 'A']  # Remove invalid entries
-    
+    # chunk['category'] = chunk['category'].map(CATEGORY_MAPPINGS).fillna(chunk['category'])
+
     # Add region column
-    df_2025['region'] = df_2025['country'].apply(get_region)
-    
+    chunk['region'] = get_regions(chunk['country'])
+
     # Reorder columns to match 2024 format
-    df_2025 = df_2025[['category', 'cohort', 'country', 'region']]
-    
+    return chunk[['category', 'cohort', 'country', 'region']]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--input', default=INPUT_FILE, help='Original 2025 export')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='Cleaned CSV to write')
+    parser.add_argument(
+        '--chunksize',
+        type=int,
+        default=100_000,
+        help='Rows processed at a time; memory use does not grow with the input size',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only clean the chunks of the input that changed since the last run',
+    )
+    args = parser.parse_args()
+
+    # Read the 2025 original data
+    print("Reading 2025 original data...")
+    columns = read_header(args.input)
+    print(f"Original columns: {columns}")
+
+    rules_hash = get_rules_hash(columns, args.chunksize)
+    manifest = read_manifest(args.output)
+    previous_chunks = []
+    if args.incremental:
+        if manifest is not None and can_reuse_output(manifest, args.output, rules_hash):
+            previous_chunks = manifest['chunks']
+        else:
+            print("No reusable manifest found, processing the whole input...")
+
+    # Clean the data chunk by chunk, writing each one as soon as it is ready
+    print("Cleaning data...")
+    print(f"Saving cleaned data to {args.output}...")
+    original_rows = 0
+    cleaned_rows = 0
+    reused_chunks = 0
+    head = None
+    unknown_rows = 0
+    unknown_countries = {}
+    seen = {column: set() for column in ['category', 'cohort', 'country', 'region']}
+    chunks = []
+    f = None
+    try:
+        for index, raw in enumerate(read_raw_chunks(args.input, args.chunksize)):
+            input_hash = hashlib.sha1(raw).hexdigest()
+            original_rows += raw.count(b'\n') + (not raw.endswith(b'\n'))
+
+            # Chunks are reused up to the first one that changed. Everything after it
+            # is cleaned again and appended, since its output offset may have moved
+            if f is None and index < len(previous_chunks):
+                previous = previous_chunks[index]
+                if previous['input_hash'] == input_hash:
+                    chunks.append(previous)
+                    cleaned_rows += previous['output_rows']
+                    reused_chunks += 1
+                    continue
+
+            if f is None:
+                offset = chunks[-1]['output_end'] if chunks else 0
+                f = open(args.output, 'r+b' if offset else 'wb')
+                f.truncate(offset)
+                f.seek(offset)
+
+            chunk = clean_chunk(parse_chunk(raw, columns))
+            data = chunk.to_csv(sep=';', index=False, header=index == 0).encode()
+            f.write(data)
+            chunks.append({
+                'input_hash': input_hash,
+                'output_hash': hashlib.sha1(data).hexdigest(),
+                'output_rows': len(chunk),
+                'output_end': f.tell(),
+            })
+            cleaned_rows += len(chunk)
+
+            if head is None or len(head) < 5:
+                head = chunk.head(5) if head is None else pd.concat([head, chunk]).head(5)
+            for column, values in seen.items():
+                values.update(chunk[column].dropna().unique())
+            unknown = chunk.loc[chunk['region'] == 'UNKNOWN', 'country']
+            unknown_rows += len(unknown)
+            unknown_countries.update(dict.fromkeys(unknown.unique()))
+    finally:
+        if f is not None:
+            f.close()
+
+    if f is None and len(chunks) < len(previous_chunks):
+        # Rows were only removed from the end of the input
+        os.truncate(args.output, chunks[-1]['output_end'] if chunks else 0)
+
+    unchanged = (
+        manifest is not None
+        and manifest.get('rules') == rules_hash
+        and manifest.get('chunks') == chunks
+    )
+    if unchanged and previous_chunks:
+        print("The input did not change, the output is up to date.")
+    elif unchanged:
+        # The output was written again with the same content, so it keeps its version
+        # and the caches built from it stay valid
+        print("The input did not change, the data version is kept.")
+        manifest = write_manifest(args.output, rules_hash, chunks, manifest['data_version'])
+    else:
+        data_version = manifest['data_version'] + 1 if manifest else 1
+        manifest = write_manifest(args.output, rules_hash, chunks, data_version)
+    print(f"Data version: {manifest['version']}")
+    if args.incremental:
+        print(f"Reused {reused_chunks} of {len(chunks)} chunks from the previous run")
+
+    print(f"Original data shape: ({original_rows}, {len(columns)})")
+
     # Check for unknown regions
-    unknown_regions = df_2025[df_2025['region'] == 'UNKNOWN']
-    if not unknown_regions.empty:
-        print(f"Warning: Found {len(unknown_regions)} rows with unknown regions:")
-        print(unknown_regions['country'].unique())
-    
-    # Save the cleaned data
-    output_file = '../dashboard/data/anonymized_cb_data_2025.csv'
-    print(f"Saving cleaned data to {output_file}...")
-    df_2025.to_csv(output_file, sep=';', index=False)
-    
-    print(f"Cleaned data shape: {df_2025.shape}")
-    print(f"Final columns: {df_2025.columns.tolist()}")
-    
+    if unknown_rows:
+        print(f"Warning: Found {unknown_rows} rows with unknown regions:")
+        print(list(unknown_countries))
+
+    print(f"Cleaned data shape: ({cleaned_rows}, 4)")
+    print("Final columns: ['category', 'cohort', 'country', 'region']")
+
     # Show some statistics
-    print("\nData summary:")
-    print(f"Categories: {sorted(df_2025['category'].unique())}")
-    print(f"Cohorts: {sorted(df_2025['cohort'].unique())}")
-    print(f"Countries: {len(df_2025['country'].unique())} unique countries")
-    print(f"Regions: {sorted(df_2025['region'].unique())}")
-    
-    print("\nFirst few rows of cleaned data:")
-    print(df_2025.head())
-    
-    # Clean up temporary file
-    import os
-    if os.path.exists('temp_2025.csv'):
-        os.remove('temp_2025.csv')
+    if reused_chunks:
+        print("\nData summary (of the rows cleaned in this run):")
+    else:
+        print("\nData summary:")
+    print(f"Categories: {sorted(seen['category'])}")
+    print(f"Cohorts: {sorted(seen['cohort'])}")
+    print(f"Countries: {len(seen['country'])} unique countries")
+    print(f"Regions: {sorted(seen['region'])}")
+
+    if head is not None:
+        print("\nFirst few rows of cleaned data:")
+        print(head)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
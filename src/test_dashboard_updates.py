@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that the charts shown in the browser follow the filters.
+
+A headless session of the dashboard is driven like a browser would drive it, by
+clicking a slice of a chart, the *Clear filters* button, another year or the dark
+mode. The widget messages sent back are applied to a copy of the state of every
+chart, the way plotly.js applies them. After each step, the traces of each chart
+must have the values of the figure built from the data for the same filters, and
+its template must be the one of the selected mode.
+"""
+
+import asyncio
+import base64
+import json
+import sys
+import warnings
+
+import numpy as np
+
+from benchmark_dashboard import CHART_OUTPUTS, BenchmarkSession
+
+warnings.filterwarnings("ignore", message="CartoDB tiles now require an API key")
+
+# Chart of each output, by the name of the function creating its figure
+CHARTS = {
+    "plot_0": "create_region_figure",
+    "plot_1": "create_category_figure",
+    "plot_2": "create_cohort_figure",
+    "plot_3": "create_top_countries_figure",
+    "plot_4": "create_cohort_category_figure",
+}
+
+# Trace properties that depend on the data
+DATA_PROPERTIES = ("labels", "values", "x", "y", "text", "pull")
+
+
+def _set_path(target, path, value):
+    """Set the property at the dotted ``path``, or delete it if ``value`` is None."""
+    *parents, key = path.split(".")
+    for parent in parents:
+        target = target.setdefault(parent, {})
+    if value is None:
+        target.pop(key, None)
+    else:
+        target[key] = value
+
+
+def _insert_buffers(data, buffer_paths, buffers):
+    """Replace the binary arrays of a widget message by their values."""
+    for path, buffer in zip(buffer_paths, buffers):
+        parent = data
+        for key in path[:-2]:
+            parent = parent[key]
+        array = parent[path[-2]]
+        values = np.frombuffer(base64.b64decode(buffer), dtype=array["dtype"])
+        parent[path[-2]] = values.reshape(array["shape"]).tolist()
+
+
+class BrowserCharts:
+    """Figures of the charts as plotly.js would show them in the browser."""
+
+    def __init__(self):
+        self.figures = {}
+
+    def apply(self, messages):
+        for raw in messages:
+            custom = json.loads(raw).get("custom", {})
+            for key in ("shinywidgets_comm_open", "shinywidgets_comm_msg"):
+                if key in custom:
+                    message = json.loads(custom[key])
+                    self._apply_comm(message)
+
+    def _apply_comm(self, message):
+        content = message["content"]
+        data = content["data"]
+        state = data.get("state")
+        if not state:
+            return
+        _insert_buffers(state, data.get("buffer_paths", []), message["buffers"])
+        figure = self.figures.setdefault(content["comm_id"], {"data": [], "layout": {}})
+        if "_data" in state:
+            figure["data"] = state["_data"]
+        if "_layout" in state:
+            figure["layout"] = state["_layout"]
+        update = state.get("_py2js_update") or state.get("_py2js_relayout")
+        if update:
+            layout = update.get("layout_data", update.get("relayout_data", {}))
+            for path, value in layout.items():
+                _set_path(figure["layout"], path, value)
+        update = state.get("_py2js_update") or state.get("_py2js_restyle")
+        if update:
+            style = update.get("style_data", update.get("restyle_data"))
+            traces = update.get("style_traces", update.get("restyle_traces"))
+            if traces is None:
+                traces = range(len(figure["data"]))
+            for path, values in style.items():
+                for trace, value in zip(traces, values):
+                    # Like in plotly.js, undefined values leave the trace as is
+                    if value != "_undefined_":
+                        _set_path(figure["data"][trace], path, value)
+        if state.get("_py2js_addTraces"):
+            figure["data"].extend(state["_py2js_addTraces"]["trace_data"])
+        if state.get("_py2js_deleteTraces"):
+            deleted = set(state["_py2js_deleteTraces"]["delete_inds"])
+            figure["data"] = [
+                trace for i, trace in enumerate(figure["data"]) if i not in deleted
+            ]
+
+
+def _normalize(value):
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    return value
+
+
+def expected_figure(name, year, filters, dark_mode="light"):
+    import app
+
+    create_figure = getattr(app, CHARTS[name])
+    cached = app.get_cached_figure(create_figure, app.partitions[year], filters)
+    return app.style_figure(cached, dark_mode, "Custom")
+
+
+def _without_margin(template):
+    # shinywidgets sets the margin of the template of each widget it renders
+    layout = {k: v for k, v in template.get("layout", {}).items() if k != "margin"}
+    return {**template, "layout": layout}
+
+
+def compare(browser, model_ids, year, filters, dark_mode="light"):
+    """Names of the charts whose traces or template differ from the expected figure."""
+    wrong = []
+    for name in CHARTS:
+        shown = browser.figures[model_ids[name]]
+        expected = expected_figure(name, year, filters, dark_mode)
+        same = len(shown["data"]) == len(expected["data"]) and all(
+            _normalize(a.get(key)) == _normalize(b.get(key))
+            for a, b in zip(shown["data"], expected["data"])
+            for key in DATA_PROPERTIES
+        )
+        template = json.loads(json.dumps(expected["layout"]["template"]))
+        same = same and _without_margin(shown["layout"]["template"]) == template
+        if not same:
+            wrong.append(name)
+    return wrong
+
+
+def click_message(model_id, point):
+    """Message of the browser for a click on ``point`` of the first trace of a chart."""
+    points = {
+        "trace_indexes": [0],
+        "point_indexes": [point],
+        "xs": [None],
+        "ys": [None],
+    }
+    state = {
+        "_js2py_pointsCallback": {
+            "event_type": "plotly_click",
+            "points": points,
+            "selector": None,
+        }
+    }
+    message = {
+        "content": {
+            "comm_id": model_id,
+            "data": {"method": "update", "state": state, "buffer_paths": []},
+        },
+        "buffers": [],
+    }
+    return json.dumps(message)
+
+
+async def run_checks():
+    import app
+
+    year = app.partitions.latest_year
+    browser = BrowserCharts()
+    session = BenchmarkSession(app.app, "test")
+    messages = await session.start(CHART_OUTPUTS)
+    values = {}
+    for raw in messages:
+        values.update(json.loads(raw).get("values", {}))
+    model_ids = {name: values[name]["model_id"] for name in CHARTS}
+
+    async def step(inputs):
+        start = len(session.conn.messages)
+        await session.update(**inputs)
+        await session.settle()
+        browser.apply(session.conn.messages[start:])
+
+    def click_on(name, column, value):
+        labels = browser.figures[model_ids[name]]["data"][0][column]
+        return {
+            "shinywidgets_comm_send": click_message(
+                model_ids[name], labels.index(value)
+            )
+        }
+
+    browser.apply(session.conn.messages)
+    results = [("initial charts", compare(browser, model_ids, year, ()))]
+
+    await step(click_on("plot_0", "labels", "APJ"))
+    filters = (("region", "APJ"),)
+    results.append(
+        ("click on the APJ region", compare(browser, model_ids, year, filters))
+    )
+
+    cohort = browser.figures[model_ids["plot_2"]]["data"][0]["labels"][0]
+    await step(click_on("plot_2", "labels", cohort))
+    filters = (("cohort", cohort), ("region", "APJ"))
+    results.append(
+        (f"click on the {cohort} cohort", compare(browser, model_ids, year, filters))
+    )
+
+    await step(click_on("plot_0", "labels", "APJ"))
+    filters = (("cohort", cohort),)
+    results.append(
+        ("click on the APJ region again", compare(browser, model_ids, year, filters))
+    )
+
+    await step({"clear_filters": 1})
+    results.append(("clear filters", compare(browser, model_ids, year, ())))
+
+    # Filters are reset when another year is selected
+    await step(click_on("plot_0", "labels", "APJ"))
+    other_year = min(app.partitions.years)
+    await step({"year": str(other_year)})
+    results.append(
+        (f"switch to {other_year}", compare(browser, model_ids, other_year, ()))
+    )
+
+    await step({"year": str(year)})
+    results.append((f"switch back to {year}", compare(browser, model_ids, year, ())))
+
+    await step({"dark_mode": "dark"})
+    results.append(("dark mode", compare(browser, model_ids, year, (), "dark")))
+
+    await step({"dark_mode": "light"})
+    results.append(("light mode", compare(browser, model_ids, year, ())))
+
+    await session.close()
+    return results
+
+
+def check_relayout():
+    """Check the private plotly calls of the fast relayout of the chart layouts.
+
+    They are only used with the version of plotly they were checked against, and
+    must change the layout like plotly_relayout() does.
+    """
+    import app
+    import plotly
+    import plotly.graph_objects as go
+    from plotly_streaming import (
+        _RELAYOUT_PLOTLY_VERSION,
+        _diff_properties,
+        _property_paths,
+        _relayout,
+    )
+
+    if plotly.__version__ != _RELAYOUT_PLOTLY_VERSION:
+        print(
+            f"  ❌ The fast relayout was checked against plotly "
+            f"{_RELAYOUT_PLOTLY_VERSION}, not {plotly.__version__}"
+        )
+        return [("relayout of the dark mode", list(CHARTS))]
+
+    year = app.partitions.latest_year
+    wrong = []
+    for name in CHARTS:
+        light = expected_figure(name, year, ())
+        dark = expected_figure(name, year, (), "dark")
+        changes = _diff_properties(light["layout"], dark["layout"])
+        fast, public = go.Figure(light), go.Figure(light)
+        _relayout(fast, changes)
+        public.plotly_relayout(_property_paths(changes))
+        if fast.to_dict()["layout"] != public.to_dict()["layout"]:
+            wrong.append(name)
+    return [("relayout of the dark mode", wrong)]
+
+
+def main():
+    print("Testing the updates of the charts...")
+
+    results = asyncio.new_event_loop().run_until_complete(run_checks())
+    results += check_relayout()
+
+    failures = 0
+    for name, wrong in results:
+        if wrong:
+            print(f"  ❌ {name}: {', '.join(wrong)} not updated")
+            failures += 1
+        else:
+            print(f"  ✅ {name}")
+
+    if failures:
+        print(f"\n❌ {failures} update checks failed!")
+        sys.exit(1)
+    print("\n✅ All update checks passed!")
+
+
+if __name__ == "__main__":
+    main()
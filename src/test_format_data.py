@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that the incremental formatting of the 2025 data writes the
+same output as a full rebuild.
+
+A sample of the original export is formatted in chunks, changed (rows appended,
+edited or removed), and formatted again with --incremental. The output must be the
+same as the one of a full rebuild of the changed input, and the data version must
+only be bumped when the content of the output changed.
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+import format_2025_data
+
+INPUT_FILE = (
+    Path(__file__).resolve().parent.parent
+    / "dashboard"
+    / "data"
+    / "anonymized_cb_data_2025_original.csv"
+)
+
+# Rows of the sample and rows per chunk, so that the sample spans several chunks
+ROWS = 500
+CHUNKSIZE = 100
+
+
+def run_format(input_file, output_file, incremental=False):
+    """Format ``input_file`` into ``output_file`` and return the manifest written."""
+    argv = sys.argv
+    sys.argv = [
+        "format_2025_data.py",
+        "--input",
+        str(input_file),
+        "--output",
+        str(output_file),
+        "--chunksize",
+        str(CHUNKSIZE),
+    ]
+    if incremental:
+        sys.argv.append("--incremental")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            format_2025_data.main()
+    finally:
+        sys.argv = argv
+    return format_2025_data.read_manifest(output_file)
+
+
+def content_version(manifest):
+    """Part of the version of the data that only depends on the content."""
+    return manifest["version"].split("-", 1)[1]
+
+
+def edit_middle_row(rows):
+    rows = list(rows)
+    category, rest = rows[ROWS // 2].split(b",", 1)
+    other = b"Data" if category != b"Data" else b"Serverless"
+    rows[ROWS // 2] = other + b"," + rest
+    return rows
+
+
+def remove_middle_row(rows):
+    return rows[: ROWS // 2] + rows[ROWS // 2 + 1 :]
+
+
+# Changes of the input, applied to the data rows of the sample
+CASES = {
+    "append rows": lambda rows, extra: rows + extra,
+    "edit a middle row": lambda rows, extra: edit_middle_row(rows),
+    "remove a middle row": lambda rows, extra: remove_middle_row(rows),
+    # Only whole chunks are removed, so the output is only truncated
+    "remove chunks from the end": lambda rows, extra: rows[: -2 * CHUNKSIZE],
+    "remove rows from the end": lambda rows, extra: rows[: -(CHUNKSIZE + 30)],
+    "no change": lambda rows, extra: rows,
+}
+
+
+def check_case(directory, header, rows, extra, change):
+    """Problems found for one change of the input, empty if there are none."""
+    input_file = directory / "original.csv"
+    output_file = directory / "cleaned.csv"
+    rebuilt_file = directory / "rebuilt.csv"
+
+    input_file.write_bytes(header + b"".join(rows))
+    before = run_format(input_file, output_file)
+    mtime = output_file.stat().st_mtime_ns
+
+    changed = change(rows, extra)
+    input_file.write_bytes(header + b"".join(changed))
+    after = run_format(input_file, output_file, incremental=True)
+    rebuilt = run_format(input_file, rebuilt_file)
+
+    problems = []
+    if output_file.read_bytes() != rebuilt_file.read_bytes():
+        problems.append("output differs from a full rebuild")
+    if after["chunks"] != rebuilt["chunks"]:
+        problems.append("chunks differ from a full rebuild")
+    if content_version(after) != content_version(rebuilt):
+        problems.append("version differs from a full rebuild")
+    if changed == rows:
+        if after["data_version"] != before["data_version"]:
+            problems.append("data version bumped")
+        if output_file.stat().st_mtime_ns != mtime:
+            problems.append("output written again")
+    elif after["data_version"] != before["data_version"] + 1:
+        problems.append("data version not bumped")
+    return problems
+
+
+def check_full_rebuild(directory, header, rows):
+    """Problems of a full run on an input that did not change."""
+    input_file = directory / "original.csv"
+    output_file = directory / "cleaned.csv"
+    input_file.write_bytes(header + b"".join(rows))
+    before = run_format(input_file, output_file)
+    after = run_format(input_file, output_file)
+
+    problems = []
+    if after["data_version"] != before["data_version"]:
+        problems.append("data version bumped")
+    rules = format_2025_data.get_rules_hash(
+        format_2025_data.read_header(input_file), CHUNKSIZE
+    )
+    if not format_2025_data.can_reuse_output(after, output_file, rules):
+        problems.append("manifest does not match the output")
+    return problems
+
+
+def main():
+    print("Testing the incremental formatting of the 2025 data...")
+
+    with open(INPUT_FILE, "rb") as f:
+        lines = f.readlines()
+    header, rows, extra = lines[0], lines[1 : ROWS + 1], lines[ROWS + 1 : ROWS + 151]
+
+    results = []
+    for name, change in CASES.items():
+        with tempfile.TemporaryDirectory() as directory:
+            problems = check_case(Path(directory), header, rows, extra, change)
+        results.append((name, problems))
+    with tempfile.TemporaryDirectory() as directory:
+        problems = check_full_rebuild(Path(directory), header, rows)
+    results.append(("full run without changes", problems))
+
+    failures = 0
+    for name, problems in results:
+        if problems:
+            print(f"  ❌ {name}: {', '.join(problems)}")
+            failures += 1
+        else:
+            print(f"  ✅ {name}")
+
+    if failures:
+        print(f"\n❌ {failures} formatting checks failed!")
+        sys.exit(1)
+    print("\n✅ All formatting checks passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that the structural hashes used by render_plotly_streaming
+are stable and match between equal inputs.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from plotly_streaming import _hash_anything  # noqa: E402
+
+
+def make_frame():
+    return pd.DataFrame(
+        {
+            "category": pd.Categorical(["Data", "Serverless", "Data"]),
+            "cohort": ["2023", "2024", "2025"],
+            "count": np.array([10, 20, 30], dtype=np.int64),
+        }
+    )
+
+
+def main():
+    print("Testing structural hashing...")
+
+    # Pairs of objects that must have the same hash
+    equal_pairs = [
+        ("None", None, None),
+        (
+            "nested containers",
+            {"a": [1, 2.5, "x"], "b": None},
+            {"b": None, "a": [1, 2.5, "x"]},
+        ),
+        ("numpy arrays", np.arange(1000), np.arange(1000)),
+        ("non-contiguous arrays", np.arange(20)[::2], np.arange(0, 20, 2)),
+        (
+            "object arrays",
+            np.array(["a", None], dtype=object),
+            np.array(["a", None], dtype=object),
+        ),
+        ("series", pd.Series([1, 2, 3], name="x"), pd.Series([1, 2, 3], name="x")),
+        ("data frames", make_frame(), make_frame()),
+        ("numpy scalars", np.int64(3), np.int64(3)),
+    ]
+
+    # Pairs of objects that must have different hashes
+    different_pairs = [
+        ("int and float", 1, 1.0),
+        ("int and bool", 1, True),
+        ("int and str", 1, "1"),
+        ("list and tuple", [1, 2], (1, 2)),
+        ("array values", np.arange(1000), np.arange(1, 1001)),
+        ("array dtypes", np.arange(10, dtype=np.int32), np.arange(10, dtype=np.int64)),
+        ("array shapes", np.zeros((2, 3)), np.zeros((3, 2))),
+        (
+            "series names",
+            pd.Series([1, 2, 3], name="x"),
+            pd.Series([1, 2, 3], name="y"),
+        ),
+        (
+            "series index",
+            pd.Series([1, 2], index=[0, 1]),
+            pd.Series([1, 2], index=[1, 0]),
+        ),
+        ("frame values", make_frame(), make_frame().assign(count=[10, 20, 31])),
+        ("frame columns", make_frame(), make_frame().rename(columns={"count": "n"})),
+        ("frame dtypes", make_frame(), make_frame().astype({"count": "float64"})),
+    ]
+
+    # Digests that must be the same in every process, whatever the hash seed
+    known_digests = [
+        (
+            "numpy array",
+            np.arange(10, dtype=np.int64),
+            "6965432da33dcd968c8d5ec31048a78f",
+        ),
+        (
+            "nested containers",
+            {"a": [1, 2.5, "x"], "b": None},
+            "3c01210b268b48ec867be1a57f13fe62",
+        ),
+        ("data frame", make_frame(), "59fa68d15048c9b0cc34ef0259726adb"),
+    ]
+
+    failures = 0
+    for name, obj, digest in known_digests:
+        if _hash_anything(obj) != digest:
+            print(f"  ❌ The hash of the {name} changed")
+            failures += 1
+    for name, a, b in equal_pairs:
+        first = _hash_anything(a)
+        if first != _hash_anything(b) or first != _hash_anything(a):
+            print(f"  ❌ Equal {name} have different hashes")
+            failures += 1
+    for name, a, b in different_pairs:
+        if _hash_anything(a) == _hash_anything(b):
+            print(f"  ❌ Different {name} have the same hash")
+            failures += 1
+
+    print("\nSummary:")
+    print(f"- Known digests checked: {len(known_digests)}")
+    print(f"- Equal pairs checked: {len(equal_pairs)}")
+    print(f"- Different pairs checked: {len(different_pairs)}")
+
+    if failures:
+        print(f"\n❌ {failures} hashing checks failed!")
+        sys.exit(1)
+    print("\n✅ All hashing checks passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,77 @@
 #!/usr/bin/env python3
 """
-Script to update countries.csv to only contain metadata (GPS coordinates)
-and identify any missing countries from the CB data.
+Script to update the country lookup table (geo.csv) from the CB data: fills in the
+missing regions and identifies any countries from the CB data missing from it.
 """
 
+import sys
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from dataset import get_partitions  # noqa: E402
+from geo import GEO_FILE, get_geo_table  # noqa: E402
+
 def main():
-    # Read the CB data to get all countries
+    # Read the CB data of every year to get all countries and their regions
     print("Reading CB data...")
-    df_cb = pd.read_csv('../dashboard/data/anonymized_cb_data_2025.csv', sep=';')
-    cb_countries = set(df_cb['country'].unique())
-    print(f"Countries in CB data: {len(cb_countries)}")
-    
-    # Read the current countries metadata
-    print("Reading countries metadata...")
-    df_countries = pd.read_csv('../dashboard/data/countries_temp.csv', sep=';')
-    metadata_countries = set(df_countries['country'].unique())
-    print(f"Countries in metadata: {len(metadata_countries)}")
-    
-    # Find missing countries
-    missing_countries = cb_countries - metadata_countries
-    extra_countries = metadata_countries - cb_countries
-    
-    print(f"\nCountries in CB data but missing from metadata: {len(missing_countries)}")
+    partitions = get_partitions()
+    df_cb = pd.concat(
+        [partitions[year].frame[['country', 'region']].astype(object) for year in partitions.years],
+        ignore_index=True,
+    )
+    cb_countries = set(df_cb['country'].dropna().unique())
+    print(f"Countries in CB data ({', '.join(map(str, partitions.years))}): {len(cb_countries)}")
+
+    # Read the country lookup table
+    print("Reading country lookup table...")
+    geo = get_geo_table()
+    print(f"Countries in lookup table: {len(geo)}")
+
+    # Find missing countries, by name or alias
+    rows = geo.find(sorted(cb_countries))
+    missing_countries = sorted(np.asarray(sorted(cb_countries), dtype=object)[rows < 0])
+    extra_countries = sorted(set(geo.countries) - set(geo.countries[rows[rows >= 0]]))
+
+    print(f"\nCountries in CB data but missing from the lookup table: {len(missing_countries)}")
     if missing_countries:
-        print("Missing countries:", sorted(missing_countries))
-    
-    print(f"\nCountries in metadata but not in CB data: {len(extra_countries)}")
+        print("Missing countries:", missing_countries)
+        print("Add them to geo.csv with their ISO code, region and GPS coordinates.")
+
+    print(f"\nCountries in the lookup table but not in CB data: {len(extra_countries)}")
     if extra_countries:
-        print("Extra countries:", sorted(extra_countries))
-    
-    # Add approximate GPS coordinates for missing countries
-    # These are rough center coordinates - in a real scenario you'd want more precise data
-    missing_coords = {
-        'Angola': (-11.2027, 17.8739),
-        'Albania': (41.1533, 20.1683),
-        'Luxembourg': (49.8153, 6.1296),
-        'Slovenia': (46.1512, 14.9955),
-        'Lithuania': (55.1694, 23.8813),
-        'San Marino': (43.9424, 12.4578),
-        'Congo': (-4.0383, 21.7587),
-        'Senegal': (14.4974, -14.4524),
-        'Bolivia': (-16.2902, -63.5887),
-        'Uganda': (1.3733, 32.2903),
-        'Palestinian Territory': (31.9522, 35.2332),
-    }
-    
-    # Add missing countries to the dataframe
-    new_rows = []
-    for country in missing_countries:
-        if country in missing_coords:
-            lat, lon = missing_coords[country]
-            new_rows.append({
-                'country': country,
-                'latitud': lat,
-                'longitud': lon
-            })
-        else:
-            print(f"Warning: No GPS coordinates available for {country}")
-    
-    if new_rows:
-        df_new = pd.DataFrame(new_rows)
-        df_countries = pd.concat([df_countries, df_new], ignore_index=True)
-        df_countries = df_countries.sort_values('country')
-    
-    # Save the updated countries metadata
-    print(f"\nSaving updated countries metadata with {len(df_countries)} countries...")
-    df_countries.to_csv('../dashboard/data/countries.csv', sep=';', index=False)
-    
-    print("Countries metadata updated successfully!")
-    print("The countries.csv file now contains only GPS coordinates.")
-    print("Country counts will be calculated dynamically from the CB data.")
+        print("Extra countries:", extra_countries)
+
+    # Countries without coordinates are left out of the map
+    no_coords = geo.countries[np.isnan(geo.coordinates).any(axis=1)]
+    for country in no_coords:
+        print(f"Warning: No GPS coordinates available for {country}")
+
+    # Fill in the missing regions with the most common region of the country in the data
+    df_cb = df_cb.dropna()
+    df_cb['row'] = geo.find(df_cb['country'])
+    regions = (
+        df_cb[df_cb['row'] >= 0]
+        .groupby('row')['region']
+        .agg(lambda values: values.value_counts().index[0])
+    )
+    df_geo = pd.read_csv(GEO_FILE, sep=';', dtype=str, keep_default_na=False)
+    filled = []
+    for row, region in regions.items():
+        if not df_geo.at[row, 'region']:
+            df_geo.at[row, 'region'] = region
+            filled.append(f"{df_geo.at[row, 'country']} ({region})")
+
+    if filled:
+        print(f"\nFilled in the region of {len(filled)} countries: {', '.join(filled)}")
+        print(f"Saving updated lookup table with {len(df_geo)} countries...")
+        df_geo.to_csv(GEO_FILE, sep=';', index=False, lineterminator='\n')
+        print("Country lookup table updated successfully!")
+    else:
+        print("\nThe country lookup table is up to date.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
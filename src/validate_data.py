@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Script to validate the CB data snapshots.
+
+All the checks are computed from a single pass over the dictionary codes of the
+data: the rows are counted by category, by cohort, by country, by region and by
+country and region together (with missing values as an extra position of each
+axis), and the checks only look at these counts, whose size does not depend on
+the number of rows. The rows are processed in chunks straight from the
+memory-mapped sidecar of the dataset, so memory use does not grow with the size of
+the data either.
+
+Checks (errors make the script exit with 1, warnings do not):
+    nulls               Rows with a missing value in any column (error)
+    unknown_regions     Rows whose region is not one of the known regions (error)
+    missing_gps         Rows whose country has no GPS coordinates in geo.csv (error)
+    invalid_categories  Rows whose category is not known to the dashboard (error)
+    invalid_cohorts     Rows whose cohort is not a year, e.g. 2024 or 2020 beta (error)
+    region_mismatches   Rows whose region differs from the one in geo.csv (warning)
+
+Usage:
+    python validate_data.py                         # Validate every yearly snapshot
+    python validate_data.py --year 2025             # Validate one snapshot
+    python validate_data.py --report report.json    # Also write the JSON report
+    python validate_data.py --synthetic 20000000    # Validate 20M synthetic rows
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "dashboard"))
+
+from dataset import get_partitions  # noqa: E402
+from geo import get_geo_table  # noqa: E402
+
+COLUMNS = ["category", "cohort", "country", "region"]
+
+# Categories the dashboard has colors for (category_colors in dashboard/app.py)
+KNOWN_CATEGORIES = [
+    "AI Engineering",
+    "Cloud Operations",
+    "Containers",
+    "Data",
+    "Dev Tools",
+    "Front-End Web & Mobile",
+    "Game Tech",
+    "Machine Learning",
+    "Machine Learning & GenAI",
+    "Network C&D",
+    "Networking & Content Delivery",
+    "Security",
+    "Security & Identity",
+    "Serverless",
+    "Storage",
+]
+
+COHORT_PATTERN = re.compile(r"\d{4}( beta)?")
+
+# Rows counted at a time
+CHUNKSIZE = 1_000_000
+
+# Number of countries listed in the summary of the largest countries
+TOP_COUNTRIES = 10
+
+
+def count_rows(frame, chunksize=CHUNKSIZE):
+    """Count the rows of ``frame`` by each of COLUMNS, and by country and region.
+
+    Only the counts the checks need are kept: counting every combination of values
+    of all the columns would take one counter per combination, which explodes on
+    dirty data with many distinct values.
+
+    Returns
+    -------
+    tuple
+        The counts by each column and the counts by country and region, where the
+        last position of each axis counts the missing values, the number of rows
+        with a missing value, and the labels of the other positions.
+    """
+    labels = [list(frame[column].cat.categories) for column in COLUMNS]
+    sizes = [len(values) + 1 for values in labels]
+    codes = [frame[column].cat.codes.to_numpy() for column in COLUMNS]
+    country, region = COLUMNS.index("country"), COLUMNS.index("region")
+    pair_shape = (sizes[country], sizes[region])
+    by_column = [np.zeros(size, dtype=np.int64) for size in sizes]
+    by_pair = np.zeros(int(np.prod(pair_shape)), dtype=np.int64)
+    incomplete = 0
+    for start in range(0, len(frame), chunksize):
+        # Missing values have code -1, which wraps around to the last position
+        block = [
+            code[start : start + chunksize].astype(np.intp) % size
+            for code, size in zip(codes, sizes)
+        ]
+        for counts, values, size in zip(by_column, block, sizes):
+            counts += np.bincount(values, minlength=size)
+        flat = np.ravel_multi_index((block[country], block[region]), pair_shape)
+        by_pair += np.bincount(flat, minlength=by_pair.size)
+        missing = np.zeros(len(block[0]), dtype=bool)
+        for values, size in zip(block, sizes):
+            missing |= values == size - 1
+        incomplete += int(np.count_nonzero(missing))
+    return by_column, by_pair.reshape(pair_shape), incomplete, labels
+
+
+def rows_by_label(labels, counts, mask=None):
+    """Number of rows of each label, optionally only where ``mask`` is set."""
+    if mask is None:
+        mask = np.ones(len(labels), dtype=bool)
+    return {
+        str(label): int(rows)
+        for label, rows, selected in zip(labels, counts, mask)
+        if selected and rows
+    }
+
+
+def check(severity, rows, **details):
+    rows = int(rows)
+    return {"severity": severity, "passed": rows == 0, "rows": rows, **details}
+
+
+def validate(frame, chunksize=CHUNKSIZE):
+    """Validate a frame of CB data (see the module docstring for the checks).
+
+    Returns
+    -------
+    dict
+        JSON-serializable report with the result of every check and the
+        distribution of the rows by category, cohort, country and region.
+    """
+    missing = [column for column in COLUMNS if column not in frame.columns]
+    if missing:
+        return {
+            "rows": len(frame),
+            "passed": False,
+            "checks": {"columns": check("error", len(frame), missing=missing)},
+        }
+
+    by_column, by_pair, incomplete, labels = count_rows(frame, chunksize)
+    categories, cohorts, countries, regions = labels
+    # Everything below works on the counts of the values, not on the rows. The last
+    # position of each axis (missing values) is only used by the nulls check
+    by_category, by_cohort, by_country, by_region = (
+        counts[:-1] for counts in by_column
+    )
+    by_country_region = by_pair[:-1, :-1]
+
+    geo = get_geo_table()
+    known_regions = set(geo.regions[geo.regions != ""])
+    located, _ = geo.locate(countries)
+    expected_regions = geo.take(geo.regions, geo.find(countries), "")
+
+    unknown_region = np.array(
+        [region not in known_regions for region in regions], dtype=bool
+    )
+    invalid_category = np.array(
+        [category not in KNOWN_CATEGORIES for category in categories], dtype=bool
+    )
+    invalid_cohort = np.array(
+        [not COHORT_PATTERN.fullmatch(cohort) for cohort in cohorts], dtype=bool
+    )
+    mismatch = (
+        (expected_regions[:, None] != "")
+        & (expected_regions[:, None] != np.asarray(regions, dtype=object)[None, :])
+        & ~unknown_region[None, :]
+    )
+    mismatches = {}
+    for i, j in zip(*np.nonzero(mismatch & (by_country_region > 0))):
+        rows = int(by_country_region[i, j])
+        mismatches.setdefault(countries[i], {})[regions[j]] = rows
+
+    nulls = {column: int(counts[-1]) for column, counts in zip(COLUMNS, by_column)}
+    unknown_by_country = by_country_region[:, unknown_region].sum(axis=1)
+    checks = {
+        "nulls": check(
+            "error",
+            incomplete,
+            columns=nulls,
+        ),
+        "unknown_regions": check(
+            "error",
+            unknown_by_country.sum(),
+            regions=rows_by_label(regions, by_region, unknown_region),
+            countries=rows_by_label(countries, unknown_by_country),
+        ),
+        "missing_gps": check(
+            "error",
+            by_country[~located].sum(),
+            countries=rows_by_label(countries, by_country, ~located),
+        ),
+        "invalid_categories": check(
+            "error",
+            by_category[invalid_category].sum(),
+            categories=rows_by_label(categories, by_category, invalid_category),
+        ),
+        "invalid_cohorts": check(
+            "error",
+            by_cohort[invalid_cohort].sum(),
+            cohorts=rows_by_label(cohorts, by_cohort, invalid_cohort),
+        ),
+        "region_mismatches": check(
+            "warning",
+            by_country_region[mismatch].sum(),
+            countries=mismatches,
+        ),
+    }
+    top = np.argsort(-by_country, kind="stable")[:TOP_COUNTRIES]
+    return {
+        "rows": int(by_column[0].sum()),
+        "passed": all(c["passed"] for c in checks.values() if c["severity"] == "error"),
+        "checks": checks,
+        "distribution": {
+            "category": rows_by_label(categories, by_category),
+            "cohort": rows_by_label(cohorts, by_cohort),
+            "region": rows_by_label(regions, by_region),
+            "countries": int(np.count_nonzero(by_country)),
+            "top_countries": {
+                countries[i]: int(by_country[i]) for i in top if by_country[i]
+            },
+        },
+    }
+
+
+def synthetic_frame(frame, rows, seed=0):
+    """Frame of ``rows`` rows drawn at random from the rows of ``frame``.
+
+    Only the dictionary codes are resampled, so the synthetic data has the same
+    values and distribution as ``frame`` and takes 4 bytes per row at most.
+    """
+    positions = np.random.default_rng(seed).integers(0, len(frame), rows)
+    return pd.DataFrame(
+        {
+            column: pd.Categorical.from_codes(
+                frame[column].cat.codes.to_numpy()[positions],
+                categories=frame[column].cat.categories,
+            )
+            for column in COLUMNS
+        },
+        copy=False,
+    )
+
+
+def print_report(name, report):
+    """Print a human-readable summary of a report."""
+    print(f"\n{name}: {report['rows']} records")
+    distribution = report.get("distribution")
+    if distribution:
+        for column in ("category", "region"):
+            values = sorted(distribution[column])
+            print(f"Unique {column} values ({len(values)}): {values}")
+        print(f"Countries: {distribution['countries']}")
+        print("Data distribution by cohort:")
+        for cohort, rows in distribution["cohort"].items():
+            print(f"  {cohort}: {rows}")
+        print(f"Top {len(distribution['top_countries'])} countries by member count:")
+        for country, rows in distribution["top_countries"].items():
+            print(f"  {country}: {rows} members")
+
+    print("Checks:")
+    for name, result in report["checks"].items():
+        if result["passed"]:
+            print(f"  ✅ {name}")
+            continue
+        mark = "❌" if result["severity"] == "error" else "⚠️"
+        details = {
+            key: value
+            for key, value in result.items()
+            if key not in ("severity", "passed", "rows")
+        }
+        print(f"  {mark} {name}: {result['rows']} rows {json.dumps(details)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument(
+        "--year", type=int, action="append", help="Snapshot to validate (default: all)"
+    )
+    parser.add_argument(
+        "--report", type=Path, help="Write the JSON report to this file"
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="ROWS",
+        help="Validate this many rows drawn at random from the latest snapshot instead",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the synthetic rows"
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=CHUNKSIZE, help="Rows counted at a time"
+    )
+    args = parser.parse_args()
+
+    partitions = get_partitions()
+    if args.synthetic is not None:
+        year = (args.year or [partitions.latest_year])[-1]
+        frame = synthetic_frame(partitions[year].frame, args.synthetic, args.seed)
+        frames = {f"synthetic-{year}": (frame, None)}
+    else:
+        frames = {
+            str(year): (partitions[year].frame, partitions[year].version)
+            for year in args.year or partitions.years
+        }
+
+    reports = {}
+    for name, (frame, version) in frames.items():
+        start = time.perf_counter()
+        report = validate(frame, args.chunksize)
+        report["version"] = version
+        report["seconds"] = round(time.perf_counter() - start, 4)
+        reports[name] = report
+        print_report(name, report)
+        print(f"Validated in {report['seconds']:.2f} s")
+
+    passed = all(report["passed"] for report in reports.values())
+    if args.report:
+        report = {"passed": passed, "reports": reports}
+        args.report.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nReport saved to {args.report}")
+
+    if passed:
+        print("\n✅ All checks passed!")
+    else:
+        print("\n❌ Some checks failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()